@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Packmind server and CLI hot paths.
+
+Every case runs in a fresh process on synthetic data generated from a fixed
+seed, so runs are reproducible and peak RSS is measured per case:
+
+  catalog  ADR catalog of N documents: cold index, no-op rescan, restart
+           from the persisted index and /adr lookups
+  sarif    SARIF report of N results mapped through the CLI's streaming parser
+  traffic  concurrent gzip NDJSON uploads (first run, then an unchanged
+           re-run) while pollers read /manifest, /api/violations,
+           /api/changes and /api/summary of an in-process app
+
+usage:
+  python bench/packmind_bench.py --profile quick --save-baseline bench/baseline.json
+  python bench/packmind_bench.py --profile quick --baseline bench/baseline.json --threshold 0.25
+
+With --baseline the run fails (exit 1) when a metric regresses by more than
+the threshold: `*_ms` and `peak_rss_mb` must not grow, `*_per_s` must not
+shrink.
+"""
+import argparse
+import asyncio
+import gzip
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    "quick": [
+        ("catalog", 10), ("catalog", 500),
+        ("sarif", 1_000), ("sarif", 100_000),
+        ("traffic", 20_000),
+    ],
+    "full": [
+        ("catalog", 10), ("catalog", 500), ("catalog", 5_000),
+        ("sarif", 1_000), ("sarif", 100_000), ("sarif", 1_000_000), ("sarif", 5_000_000),
+        ("traffic", 20_000), ("traffic", 200_000),
+    ],
+}
+
+TOOLS = [("prettier", "prettier"), ("archunit", "ui_should_not_access_core"), ("eslint", "no-console")]
+# Absolute latency changes below this are noise, whatever the ratio
+MIN_DELTA_MS = 1.0
+
+
+# ─── Measurement helpers ──────────────────────────────────────────────────────
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def percentiles(prefix: str, samples_s) -> dict:
+    samples = sorted(samples_s)
+    if not samples:
+        return {}
+    q = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {f"{prefix}_p50_ms": q[49] * 1000, f"{prefix}_p99_ms": q[98] * 1000}
+
+
+def _prepare_env(workdir: str, adr_dir: str):
+    """
+    Point the server at a scratch database, ADR directory and UI build before
+    it is imported.
+    """
+    ui_dist = os.path.join(workdir, "dist")
+    os.makedirs(ui_dist, exist_ok=True)
+    os.environ.update({
+        "DB_PATH": os.path.join(workdir, "bench.db"),
+        "ADR_DIR": adr_dir,
+        "UI_DIST": ui_dist,
+        "REPO_NAME": "bench/repo",
+        "ADR_RESCAN_SECONDS": "3600",
+    })
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def _load_cli():
+    spec = importlib.util.spec_from_file_location("packmind_cli", os.path.join(ROOT, "cli", "packmind_cli.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ─── Synthetic data ───────────────────────────────────────────────────────────
+def write_adrs(adr_dir: str, n: int, rng: random.Random):
+    os.makedirs(adr_dir, exist_ok=True)
+    words = "cache index latency module boundary service layer contract schema".split()
+    for i in range(n):
+        tool, rule_id = TOOLS[i % len(TOOLS)]
+        body = "\n".join(" ".join(rng.choice(words) for _ in range(12)) for _ in range(20))
+        with open(os.path.join(adr_dir, f"ADR-BENCH-{i:05d}.md"), "w", encoding="utf-8") as fh:
+            fh.write(
+                f"---\nid: ADR-BENCH-{i:05d}\ntitle: Benchmark decision {i}\n"
+                f"enforcement:\n  tool: {tool}\n  rule_id: {rule_id}-{i}\n  severity: warning\n"
+                f"status: active\n---\n## Context\n\n{body}\n"
+            )
+
+
+def write_sarif(path: str, n: int, rng: random.Random, rules: int = 50):
+    """
+    Stream a SARIF report with `n` results spread over one run per tool.
+    """
+    per_run = -(-n // len(TOOLS))
+    written = 0
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write('{"version":"2.1.0","runs":[')
+        for r, (tool, rule_id) in enumerate(TOOLS):
+            fh.write(("," if r else "") + '{"tool":{"driver":{"name":"%s"}},"results":[' % tool)
+            count = min(per_run, n - written)
+            for i in range(count):
+                res = {
+                    "ruleId": f"{rule_id}-{rng.randrange(rules)}",
+                    "message": {"text": f"Violation {written + i} in generated code"},
+                    "locations": [{"physicalLocation": {
+                        "artifactLocation": {"uri": f"src/module{rng.randrange(500)}/File{rng.randrange(100)}.java"},
+                        "region": {"startLine": rng.randrange(1, 2000)},
+                    }}],
+                }
+                fh.write(("," if i else "") + json.dumps(res, separators=(",", ":")))
+            written += count
+            fh.write("]}")
+        fh.write("]}\n")
+
+
+def synthetic_violations(n: int, rng: random.Random, adr_ids):
+    return [
+        {
+            "adr_id": adr_ids[i % len(adr_ids)],
+            "file": f"src/module{rng.randrange(200)}/File{i % 997}.java",
+            "line": i,
+            "message": f"Generated violation {i}",
+        }
+        for i in range(n)
+    ]
+
+
+# ─── Cases ────────────────────────────────────────────────────────────────────
+def bench_catalog(n: int, seed: int, workdir: str) -> dict:
+    rng = random.Random(seed)
+    adr_dir = os.path.join(workdir, "adr")
+    write_adrs(adr_dir, n, rng)
+    _prepare_env(workdir, adr_dir)
+    from server import app as server
+    from server.adr_catalog import AdrCatalog
+
+    server.init_db()
+    start = time.perf_counter()
+    server.catalog.refresh()
+    cold = time.perf_counter() - start
+
+    rescans = []
+    for _ in range(20):
+        start = time.perf_counter()
+        server.catalog.refresh()
+        rescans.append(time.perf_counter() - start)
+
+    # A restarted worker seeds from the persisted index instead of re-parsing
+    restarted = AdrCatalog(adr_dir, repo="bench/repo", db=server.db)
+    start = time.perf_counter()
+    restarted.load_index()
+    restarted.refresh()
+    restart = time.perf_counter() - start
+
+    ids = [r["id"] for r in server.catalog.rules()]
+    lookups = []
+    for _ in range(2000):
+        adr_id = rng.choice(ids)
+        start = time.perf_counter()
+        server.catalog.get(adr_id)
+        lookups.append(time.perf_counter() - start)
+    server.db.close()
+    return {
+        "cold_index_ms": cold * 1000,
+        "docs_per_s": n / cold,
+        "restart_ms": restart * 1000,
+        **percentiles("rescan", rescans),
+        **percentiles("get_adr", lookups),
+    }
+
+
+def bench_sarif(n: int, seed: int, workdir: str) -> dict:
+    rng = random.Random(seed)
+    path = os.path.join(workdir, "report.sarif")
+    write_sarif(path, n, rng)
+    # Measure RSS growth from here on, not the generator's
+    base_rss = peak_rss_mb()
+    cli = _load_cli()
+    manifest_map = {(tool, f"{rule_id}-{i}"): f"ADR-{tool}-{i}" for tool, rule_id in TOOLS for i in range(50)}
+
+    from collections import Counter
+    # Small reports finish in milliseconds; keep the best of a few passes
+    elapsed = float("inf")
+    for _ in range(max(1, min(5, 1_000_000 // n))):
+        start = time.perf_counter()
+        mapped = sum(1 for _ in cli.map_report(path, manifest_map, False, Counter()))
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return {
+        "parse_ms": elapsed * 1000,
+        "results_per_s": mapped / elapsed,
+        "mb_per_s": os.path.getsize(path) / (1024 * 1024) / elapsed,
+        "rss_growth_mb": max(0.0, peak_rss_mb() - base_rss),
+        "streaming": cli.ijson is not None,
+    }
+
+
+async def _traffic(server, n: int, rng: random.Random, uploaders: int, pollers: int, batch: int) -> dict:
+    import httpx
+
+    adr_ids = [r["id"] for r in server.catalog.rules()]
+    violations = synthetic_violations(n, rng, adr_ids)
+    shards = [violations[i::uploaders] for i in range(uploaders)]
+    upload_lat, read_lat = [], {}
+    reads = 0
+    done = asyncio.Event()
+    transport = httpx.ASGITransport(app=server.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def upload(shard, upload_id):
+            for index in range(0, len(shard), batch):
+                body = gzip.compress(
+                    "".join(json.dumps(v) + "\n" for v in shard[index:index + batch]).encode(), compresslevel=6
+                )
+                start = time.perf_counter()
+                r = await client.post(
+                    "/api/upload",
+                    params={"repo": "bench/repo"},
+                    content=body,
+                    headers={
+                        "Content-Type": "application/x-ndjson",
+                        "Content-Encoding": "gzip",
+                        "Idempotency-Key": upload_id,
+                        "X-Batch-Index": str(index // batch),
+                    },
+                )
+                upload_lat.append(time.perf_counter() - start)
+                r.raise_for_status()
+
+        async def poll(k):
+            nonlocal reads
+            cursor = 0
+            i = k
+            while not done.is_set():
+                kind = ("manifest", "violations", "changes", "summary")[i % 4]
+                i += 1
+                url = {
+                    "manifest": "/manifest/bench/repo",
+                    "violations": f"/api/violations/bench/repo?limit=500&adr_id={rng.choice(adr_ids)}",
+                    "changes": f"/api/changes/bench/repo?since={cursor}",
+                    "summary": "/api/summary/bench/repo",
+                }[kind]
+                start = time.perf_counter()
+                r = await client.get(url)
+                read_lat.setdefault(kind, []).append(time.perf_counter() - start)
+                r.raise_for_status()
+                if kind == "changes":
+                    cursor = r.json()["cursor"]
+                reads += 1
+
+        async def run(label):
+            upload_lat.clear()
+            done.clear()
+            poll_tasks = [asyncio.create_task(poll(k)) for k in range(pollers)]
+            start = time.perf_counter()
+            await asyncio.gather(*(upload(s, f"{label}-{i}") for i, s in enumerate(shards)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await asyncio.gather(*poll_tasks)
+            return {
+                f"{label}_violations_per_s": n / elapsed,
+                **percentiles(f"{label}_upload", upload_lat),
+            }
+
+        metrics = await run("first")
+        reads_before = reads
+        start = time.perf_counter()
+        # Same violations again: the steady state of an unchanged CI run
+        metrics.update(await run("rerun"))
+        metrics["rerun_reads_per_s"] = (reads - reads_before) / (time.perf_counter() - start)
+        for kind, samples in read_lat.items():
+            metrics.update(percentiles(f"read_{kind}", samples))
+    return metrics
+
+
+def bench_traffic(n: int, seed: int, workdir: str, uploaders: int = 4, pollers: int = 8, batch: int = 1000) -> dict:
+    rng = random.Random(seed)
+    adr_dir = os.path.join(workdir, "adr")
+    write_adrs(adr_dir, 50, rng)
+    _prepare_env(workdir, adr_dir)
+    from server import app as server
+
+    async def main():
+        async with server.app.router.lifespan_context(server.app):
+            return await _traffic(server, n, rng, uploaders, pollers, batch)
+
+    return asyncio.run(main())
+
+
+CASES = {"catalog": bench_catalog, "sarif": bench_sarif, "traffic": bench_traffic}
+
+
+def run_case(kind: str, size: int, seed: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="packmind-bench-") as workdir:
+        metrics = CASES[kind](size, seed, workdir)
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+# ─── Baselines ────────────────────────────────────────────────────────────────
+def regressions(current: dict, baseline: dict, threshold: float):
+    """
+    Yield (case, metric, baseline value, current value) for every metric
+    that got worse by more than `threshold` (a fraction).
+    """
+    for case, metrics in current.items():
+        for metric, value in metrics.items():
+            old = baseline.get(case, {}).get(metric)
+            if not isinstance(old, (int, float)) or isinstance(old, bool) or isinstance(value, bool):
+                continue
+            if metric.endswith("_per_s"):
+                worse = value < old * (1 - threshold)
+            elif metric.endswith("_ms"):
+                worse = value > old * (1 + threshold) and value - old >= MIN_DELTA_MS
+            elif metric.endswith("_mb"):
+                worse = value > old * (1 + threshold)
+            else:
+                continue
+            if worse:
+                yield case, metric, old, value
+
+
+def main():
+    p = argparse.ArgumentParser(description="Packmind benchmark suite")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    p.add_argument("--case", action="append", metavar="KIND:SIZE",
+                   help="Run only these cases, e.g. sarif:1000000 (repeatable)")
+    p.add_argument("--seed", type=int, default=1234)
+    p.add_argument("--output", "-o", help="Write this run's results as JSON")
+    p.add_argument("--save-baseline", metavar="PATH", help="Save this run as the baseline")
+    p.add_argument("--baseline", metavar="PATH", help="Compare against a saved baseline")
+    p.add_argument("--threshold", type=float, default=0.25, help="Allowed regression (default: %(default)s = 25%%)")
+    args = p.parse_args()
+
+    if args.case:
+        cases = []
+        for spec in args.case:
+            kind, _, size = spec.partition(":")
+            if kind not in CASES or not size.isdigit():
+                p.error(f"invalid case {spec!r}; expected one of {', '.join(CASES)} followed by :SIZE")
+            cases.append((kind, int(size)))
+    else:
+        cases = PROFILES[args.profile]
+
+    # A fresh process per case keeps peak RSS and module state independent
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for kind, size in cases:
+        name = f"{kind}:{size}"
+        print(f"→ {name} …", flush=True)
+        with ctx.Pool(1) as pool:
+            metrics = pool.apply(run_case, (kind, size, args.seed))
+        results[name] = metrics
+        for metric, value in metrics.items():
+            shown = f"{value:.2f}" if isinstance(value, float) else value
+            print(f"    {metric:<28} {shown}")
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "seed": args.seed,
+        "results": results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"→ Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)["results"]
+        failed = list(regressions(results, baseline, args.threshold))
+        for case, metric, old, new in failed:
+            print(f"❌ {case} {metric}: {old:.2f} → {new:.2f}", file=sys.stderr)
+        if failed:
+            sys.exit(1)
+        print(f"→ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,325 @@
 #!/usr/bin/env python3
 """Simple CLI to upload linter violations mapped to ADRs."""
 import argparse
+import gzip
+import itertools
 import json
+import os
+import random
 import requests
 import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+try:
+    import ijson  # optional: constant-memory SARIF parsing
+except ImportError:
+    ijson = None
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "packmind"
+)
+
+# Responses worth retrying; anything else fails the batch immediately
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class SarifError(Exception):
+    """Raised when a SARIF report is missing or cannot be parsed."""
+
 
 def parse_args():
     p = argparse.ArgumentParser(description="Packmind Lite CLI")
-    p.add_argument("--sarif", required=True, nargs="+", action="extend", help="Path to SARIF report")
-    p.add_argument("--manifest-url", required=True, help="Base URL to manifest endpoint")
+    p.add_argument("--sarif", required=True, nargs="+", action="extend",
+                   help="Path to SARIF report (*.ndjson or - for NDJSON results, e.g. from xml2sarif.py --ndjson)")
+    p.add_argument("--manifest-url", help="Base URL to manifest endpoint")
+    p.add_argument("--manifest-file", help="Read the manifest from this JSON file instead of the server (offline mode)")
+    p.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for the cached manifest (default: %(default)s)")
+    p.add_argument("--no-cache", action="store_true", help="Always fetch the manifest without using the local cache")
+    p.add_argument("--manifest-timeout", type=float, default=10,
+                   help="Seconds to wait for the manifest server before falling back to the cache (default: %(default)s)")
     p.add_argument("--upload-url", required=True, help="URL to upload violations")
     p.add_argument("--repo", required=True, help="GitHub repository name")
     p.add_argument("--output", "-o",help="If set, write GitHub annotations JSON to the given file",required=False)
-    return p.parse_args()
+    p.add_argument("--commit", default=os.getenv("GITHUB_SHA"), help="Commit SHA the report belongs to (defaults to $GITHUB_SHA)")
+    p.add_argument("--verbose", "-v", action="store_true", help="Log every parsed and skipped SARIF result")
+    p.add_argument("--batch-size", type=int, default=5000, help="Violations per upload request")
+    p.add_argument("--concurrency", type=int, default=4, help="Upload requests in flight at once")
+    p.add_argument("--retries", type=int, default=5, help="Retries per batch on network errors and 5xx/429")
+    p.add_argument("--upload-id", default=uuid.uuid4().hex, help="Idempotency key for this run (default: random)")
+    p.add_argument("--no-gzip", action="store_true", help="Send upload batches uncompressed")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="Parse and map SARIF reports in N worker processes")
+    p.add_argument("--timings", action="store_true",
+                   help="Print how long the manifest fetch, parse, map and upload stages took")
+    p.add_argument("--full-run", nargs="*", metavar="ADR_ID",
+                   help="Treat this run as a complete scan: the server resolves open violations it did not report "
+                        "(optionally only for the given ADR ids)")
+    args = p.parse_args()
+    if not args.manifest_url and not args.manifest_file:
+        p.error("one of --manifest-url or --manifest-file is required")
+    return args
 
 
-def load_manifest(url: str, repo: str):
-    resp = requests.get(f"{url.rstrip('/')}/{repo}")
-    resp.raise_for_status()
-    data = resp.json()
+def _manifest_mapping(data: dict) -> dict:
     mapping = {}
     for rule in data.get("rules", []):
         mapping[(rule["tool"], rule["rule_id"])] = rule["id"]
-    print(f"Loaded manifest mappings: {mapping}")
     return mapping
 
 
-def parse_sarif(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        sarif = json.load(f)
-    run = sarif["runs"][0]
-    tool = run["tool"]["driver"]["name"].lower()
-    results = run.get("results", [])
-    items = []
-    print(f"Parsing SARIF report from {path}, found {len(results)} results.")
-    for res in results:
+def _manifest_cache_path(cache_dir: str, repo: str) -> str:
+    return os.path.join(cache_dir, repo.replace("/", "__") + ".json")
+
+
+def fetch_manifest(url: str, repo: str, cache_dir: str = None, timeout: float = 10):
+    """
+    Fetch the repo manifest, revalidating a cached copy with If-None-Match
+    when `cache_dir` is set. A 304 reuses the cache; if the server cannot be
+    reached, does not answer within `timeout` seconds or fails with a 5xx,
+    a cached manifest is used with a warning.
+    Returns (manifest dict, source description).
+    """
+    cache_path = _manifest_cache_path(cache_dir, repo) if cache_dir else None
+    cached = None
+    if cache_path and os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as fh:
+                cached = json.load(fh)
+        except (OSError, json.JSONDecodeError):
+            cached = None
+
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    try:
+        resp = requests.get(f"{url.rstrip('/')}/{repo}", headers=headers, timeout=timeout)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if cached:
+            print(f"⚠️  Manifest server unreachable ({e}); using cached manifest", file=sys.stderr)
+            return cached["manifest"], f"cache {cache_path} (stale)"
+        raise
+    if resp.status_code >= 500 and cached:
+        print(f"⚠️  Manifest server failed ({resp.status_code}); using cached manifest", file=sys.stderr)
+        return cached["manifest"], f"cache {cache_path} (stale)"
+    if resp.status_code == 304 and cached:
+        return cached["manifest"], f"cache {cache_path} (revalidated)"
+    resp.raise_for_status()
+    data = resp.json()
+
+    if cache_path and resp.headers.get("ETag"):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"etag": resp.headers["ETag"], "manifest": data}, fh)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️  Could not write manifest cache {cache_path}: {e}", file=sys.stderr)
+    return data, "server"
+
+
+def load_manifest(url: str, repo: str, cache_dir: str = None, manifest_file: str = None, timeout: float = 10):
+    """
+    Return the {(tool, rule_id): adr_id} mapping for `repo`, read from
+    `manifest_file` when given (offline mode) or fetched from the server.
+    """
+    if manifest_file:
+        with open(manifest_file, "r", encoding="utf-8") as fh:
+            data, source = json.load(fh), manifest_file
+    else:
+        data, source = fetch_manifest(url, repo, cache_dir, timeout)
+    mapping = _manifest_mapping(data)
+    print(f"Loaded manifest mappings from {source}: {mapping}")
+    return mapping
+
+
+# ─── Stage timings (--timings) ────────────────────────────────────────────────
+class Timings:
+    """
+    Exclusive wall-clock time per CLI stage. The pipeline is a chain of
+    generators, so `wrap` charges each stage only for the time spent producing
+    its own items, not for the stages it pulls from. Stage times reported by
+    `--jobs` workers ran in parallel with these stages, so they are kept
+    apart and reported as summed worker time.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.worker_stages = {}
+        self.started = time.perf_counter()
+        # Time spent in nested stages, one slot per stage currently running
+        self._inner = []
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def merge(self, stages: dict):
+        for name, seconds in stages.items():
+            self.worker_stages[name] = self.worker_stages.get(name, 0.0) + seconds
+
+    def _begin(self):
+        self._inner.append(0.0)
+        return time.perf_counter()
+
+    def _end(self, name: str, start: float):
+        elapsed = time.perf_counter() - start
+        self.add(name, elapsed - self._inner.pop())
+        if self._inner:
+            self._inner[-1] += elapsed
+
+    @contextmanager
+    def stage(self, name: str):
+        start = self._begin()
+        try:
+            yield
+        finally:
+            self._end(name, start)
+
+    def wrap(self, name: str, iterable):
+        it = iter(iterable)
+        while True:
+            start = self._begin()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self._end(name, start)
+            yield item
+
+    def report(self, violations: int):
+        total = time.perf_counter() - self.started
+        print("→ Timings:")
+        for name, seconds in self.stages.items():
+            print(f"    {name:<10} {seconds:8.3f}s")
+        rate = f" ({violations / total:,.0f} violations/s)" if total > 0 else ""
+        print(f"    {'total':<10} {total:8.3f}s{rate}")
+        if self.worker_stages:
+            print("  Worker time, summed across processes (overlaps the stages above):")
+            for name, seconds in self.worker_stages.items():
+                print(f"    {name:<10} {seconds:8.3f}s")
+
+
+# ─── SARIF reading ────────────────────────────────────────────────────────────
+def _stream_results(fh):
+    """
+    Yield (tool, result) for every runs[*].results[*] using ijson events, so
+    only one result object is materialized at a time. Results that appear
+    before their run's tool name (unusual, but legal) are held back until it
+    is known.
+    """
+    tool = None
+    pending = []
+    builder = None
+    for prefix, event, value in ijson.parse(fh, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == "runs.item.results.item" and event == "end_map":
+                if tool is None:
+                    pending.append(builder.value)
+                else:
+                    yield tool, builder.value
+                builder = None
+        elif prefix == "runs.item.results.item" and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == "runs.item.tool.driver.name" and event == "string":
+            tool = value.lower()
+            for res in pending:
+                yield tool, res
+            pending = []
+        elif prefix == "runs.item" and event == "end_map":
+            for res in pending:
+                yield "", res
+            tool, pending = None, []
+
+
+def _load_results(fh):
+    sarif = json.load(fh)
+    for run in sarif.get("runs", []):
+        tool = run.get("tool", {}).get("driver", {}).get("name", "").lower()
+        for res in run.get("results", []):
+            yield tool, res
+
+
+def _ndjson_results(fh):
+    """
+    Yield (tool, result) from NDJSON lines of {"tool": ..., "result": {...}},
+    as written by `xml2sarif.py --ndjson`. The stream must end with its
+    {"end": true, "count": N} trailer; without it the producer died part-way
+    and the results are incomplete.
+    """
+    count = 0
+    for line in fh:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if item.get("end"):
+            if item.get("count") != count:
+                raise SarifError(f"NDJSON stream announced {item.get('count')} result(s) but carried {count}")
+            return
+        count += 1
+        yield item.get("tool", "").lower(), item["result"]
+    raise SarifError(f"NDJSON stream ended without its end marker after {count} result(s); the producer failed")
+
+
+def iter_sarif_results(path: str):
+    """
+    Yield (tool, result) pairs for every result of every run in a SARIF file.
+    Streams the document when ijson is installed, otherwise loads it whole.
+    `-` reads NDJSON results from stdin, as does any `*.ndjson` path.
+    """
+    try:
+        if path == "-":
+            yield from _ndjson_results(sys.stdin.buffer)
+            return
+        with open(path, "rb") as fh:
+            if path.endswith(".ndjson"):
+                yield from _ndjson_results(fh)
+            elif ijson is not None:
+                yield from _stream_results(fh)
+            else:
+                yield from _load_results(fh)
+    except FileNotFoundError:
+        raise SarifError(f"SARIF file not found: {path}")
+    except json.JSONDecodeError:
+        raise SarifError(f"Failed to parse SARIF (invalid JSON): {path}")
+    except Exception as e:
+        if ijson is not None and isinstance(e, ijson.JSONError):
+            raise SarifError(f"Failed to parse SARIF (invalid JSON): {path}")
+        raise
+
+
+def iter_sarif_items(path: str, verbose: bool = False):
+    """
+    Yield one {tool, rule, file, line, msg, context} item per SARIF result.
+    `context` is the tool's line hash or source snippet when it reports one,
+    which lets the server fingerprint the violation independently of its line.
+    """
+    for tool, res in iter_sarif_results(path):
         rule = res.get("ruleId")
         msg = res.get("message", {}).get("text", "")
+        context = (res.get("partialFingerprints") or {}).get("primaryLocationLineHash")
         if res.get("locations"):
             loc = res["locations"][0]["physicalLocation"]
             file = loc["artifactLocation"]["uri"]
-            line = loc.get("region", {}).get("startLine", 1)
+            region = loc.get("region", {})
+            line = region.get("startLine", 1)
+            context = context or region.get("snippet", {}).get("text")
         else:
             file = ""
             line = 1
-        items.append({"tool": tool, "rule": rule, "file": file, "line": line, "msg": msg})
-        print(f"Parsed item: tool={tool}, rule={rule}, file={file}, line={line}, msg={msg}")
-    return items
+        if verbose:
+            print(f"Parsed item: tool={tool}, rule={rule}, file={file}, line={line}, msg={msg}")
+        yield {"tool": tool, "rule": rule, "file": file, "line": line, "msg": msg, "context": context}
+
+
+def parse_sarif(path: str):
+    return list(iter_sarif_items(path))
 
 
 def load_violations_from_sarif(sarif_path):
@@ -54,115 +327,368 @@ def load_violations_from_sarif(sarif_path):
     Read one SARIF file and return a list of violation dicts in the shape:
         { "adr_id": ..., "file": ..., "line": ..., "message": ... }
     """
-    with open(sarif_path, "r", encoding="utf-8") as f:
-        sarif = json.load(f)
-
     results = []
     # The exact SARIF schema may vary, but typically:
     # sarif["runs"][...]["results"][...] each has .ruleId, .locations, .message
-    for run in sarif.get("runs", []):
-        for res in run.get("results", []):
-            rule_id = res.get("ruleId", "")
-            # Extract location (first location= file + line)
-            locs = res.get("locations", [])
-            if locs:
-                physical = locs[0].get("physicalLocation", {})
-                artifact = physical.get("artifactLocation", {})
-                file_path = artifact.get("uri", "<unknown>")
-                region = physical.get("region", {})
-                line     = region.get("startLine", 0)
-            else:
-                file_path = "<unknown>"
-                line = 0
-
-            msg_obj = res.get("message", {})
-            message = msg_obj.get("text", "<no message>")
-
-            # We assume ruleId encodes the ADR, e.g. "ADR-CS-001"
-            # or you have some mapping from ruleId→adr_id. Adjust as needed.
-            parts   = rule_id.split("_", 1)
-            adr_id  = parts[0] if parts else ""
-            results.append({
-                "adr_id":  adr_id,
-                "file":    file_path,
-                "line":    line,
-                "message": message,
-            })
+    for _tool, res in iter_sarif_results(sarif_path):
+        rule_id = res.get("ruleId", "")
+        # Extract location (first location= file + line)
+        locs = res.get("locations", [])
+        if locs:
+            physical = locs[0].get("physicalLocation", {})
+            artifact = physical.get("artifactLocation", {})
+            file_path = artifact.get("uri", "<unknown>")
+            region = physical.get("region", {})
+            line     = region.get("startLine", 0)
+        else:
+            file_path = "<unknown>"
+            line = 0
+
+        msg_obj = res.get("message", {})
+        message = msg_obj.get("text", "<no message>")
+
+        # We assume ruleId encodes the ADR, e.g. "ADR-CS-001"
+        # or you have some mapping from ruleId→adr_id. Adjust as needed.
+        parts   = rule_id.split("_", 1)
+        adr_id  = parts[0] if parts else ""
+        results.append({
+            "adr_id":  adr_id,
+            "file":    file_path,
+            "line":    line,
+            "message": message,
+        })
     return results
 
+
+def map_report(path: str, manifest_map, verbose: bool, skipped: Counter, timings: "Timings" = None):
+    """
+    Map every result of one SARIF report through the manifest and yield
+    Packmind violation dicts. Unmapped results are tallied in `skipped`.
+    """
+    items = iter_sarif_items(path, verbose)
+    if timings is not None:
+        items = timings.wrap("parse", items)
+    for it in items:
+        key = (it["tool"], it["rule"])
+        adr_id = manifest_map.get(key)
+        if not adr_id:
+            skipped[key] += 1
+            if verbose:
+                print(f"⚠️  No ADR mapping for {key}, skipping: file={it['file']}, line={it['line']}")
+            continue
+        v = {
+            "adr_id":  adr_id,
+            "file":    it["file"],
+            "line":    it["line"],
+            "message": it["msg"],
+        }
+        if it["context"]:
+            v["context"] = it["context"]
+        yield v
+
+
+def _report_summary(path: str, loaded: int, skipped: Counter, elapsed: float):
+    for key, n in skipped.items():
+        print(f"⚠️  No ADR mapping for {key}, skipped {n} result(s)")
+    print(f"Loaded {loaded} violation(s) from {path} in {elapsed:.2f}s")
+
+
+def iter_violations(paths, manifest_map, verbose: bool = False, timings: "Timings" = None):
+    """
+    Yield the mapped violations of `paths`, one report after the other.
+    """
+    for sarif_path in paths:
+        start = time.perf_counter()
+        loaded = 0
+        skipped = Counter()
+        mapped = map_report(sarif_path, manifest_map, verbose, skipped, timings)
+        if timings is not None:
+            mapped = timings.wrap("map", mapped)
+        for v in mapped:
+            loaded += 1
+            yield v
+        _report_summary(sarif_path, loaded, skipped, time.perf_counter() - start)
+
+
+# ─── Parallel report mapping (--jobs) ─────────────────────────────────────────
+# Set once per worker process by the pool initializer, so the manifest is
+# pickled once per worker rather than once per report.
+_worker_manifest = None
+_worker_verbose = False
+_worker_timings = False
+
+
+def _init_worker(manifest_map, verbose, timings=False):
+    global _worker_manifest, _worker_verbose, _worker_timings
+    _worker_manifest, _worker_verbose, _worker_timings = manifest_map, verbose, timings
+
+
+def _map_report_to_file(path: str, out_dir: str, index: int):
+    """
+    Worker: map one report and spill its violations to an NDJSON file, so
+    results cross the process boundary as a path rather than a huge list.
+    """
+    start = time.perf_counter()
+    skipped = Counter()
+    loaded = 0
+    timings = Timings() if _worker_timings else None
+    out_path = os.path.join(out_dir, f"{index:05d}.ndjson")
+    with open(out_path, "w", encoding="utf-8") as fh:
+        mapped = map_report(path, _worker_manifest, _worker_verbose, skipped, timings)
+        if timings is not None:
+            mapped = timings.wrap("map", mapped)
+        for v in mapped:
+            fh.write(json.dumps(v) + "\n")
+            loaded += 1
+    return out_path, loaded, skipped, time.perf_counter() - start, timings.stages if timings else {}
+
+
+def iter_violations_parallel(paths, manifest_map, jobs: int, verbose: bool = False, timings: "Timings" = None):
+    """
+    Parse and map reports across a process pool. Violations are yielded in
+    the order the reports were given, whatever order the workers finish in,
+    so the output is identical to the serial path. Waiting for a worker to
+    finish counts as "workers" and reading its output back as "merge"; the
+    workers' own parse/map times are summed separately in `timings`.
+    """
+    with tempfile.TemporaryDirectory(prefix="packmind-") as tmp_dir:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(manifest_map, verbose, timings is not None),
+        ) as pool:
+            results = pool.map(_map_report_to_file, paths, itertools.repeat(tmp_dir), range(len(paths)))
+            if timings is not None:
+                results = timings.wrap("workers", results)
+            for sarif_path, (out_path, loaded, skipped, elapsed, stages) in zip(paths, results):
+                with open(out_path, "r", encoding="utf-8") as fh:
+                    lines = (json.loads(line) for line in fh)
+                    yield from timings.wrap("merge", lines) if timings is not None else lines
+                os.remove(out_path)
+                if timings is not None:
+                    timings.merge(stages)
+                _report_summary(sarif_path, loaded, skipped, elapsed)
+
+
+# ─── Upload ───────────────────────────────────────────────────────────────────
+class UploadError(Exception):
+    """Raised when a batch could not be uploaded after all retries."""
+
+
+def _batches(violations, size: int):
+    it = iter(violations)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BatchUploader:
+    """
+    Upload violations as gzip-compressed NDJSON batches over a pooled session,
+    with at most `concurrency` requests in flight. Every batch carries the
+    run's idempotency key and its index, so a retried batch that did reach the
+    server is not stored twice.
+    """
+
+    def __init__(self, url, repo, commit, upload_id, concurrency=4, retries=5, compress=True, timeout=60):
+        self.url = url
+        self.params = {"repo": repo, **({"commit": commit} if commit else {})}
+        self.upload_id = upload_id
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.compress = compress
+        self.timeout = timeout
+        self.batches = 0
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, index: int, batch: list) -> int:
+        body = "".join(json.dumps(v) + "\n" for v in batch).encode("utf-8")
+        headers = {
+            "Content-Type":    "application/x-ndjson",
+            "Idempotency-Key": self.upload_id,
+            "X-Batch-Index":   str(index),
+        }
+        if self.compress:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+
+        for attempt in range(self.retries + 1):
+            error = None
+            try:
+                r = self.session.post(self.url, params=self.params, data=body, headers=headers, timeout=self.timeout)
+                if r.status_code == 200:
+                    return len(batch)
+                error = f"{r.status_code} {r.text}"
+                if r.status_code not in RETRY_STATUSES:
+                    break
+                retry_after = r.headers.get("Retry-After", "")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+                retry_after = ""
+            if attempt < self.retries:
+                delay = float(retry_after) if retry_after.isdigit() else min(30.0, 0.5 * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+        raise UploadError(f"batch {index} failed: {error}")
+
+    def upload(self, violations, batch_size: int) -> int:
+        """
+        Upload all violations and return how many were sent. Batches are built
+        lazily, so at most about 2×`concurrency` of them are held in memory.
+        """
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = set()
+            try:
+                for index, batch in enumerate(_batches(violations, batch_size)):
+                    self.batches = index + 1
+                    if len(in_flight) >= 2 * self.concurrency:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        total += sum(f.result() for f in done)
+                    in_flight.add(pool.submit(self._post, index, batch))
+                for f in as_completed(in_flight):
+                    total += f.result()
+            except BaseException:
+                for f in in_flight:
+                    f.cancel()
+                raise
+        return total
+
+    def complete(self, adr_ids=None) -> int:
+        """
+        Tell the server this upload was a full run, so it resolves the open
+        violations the run did not report. Returns how many were resolved.
+        """
+        params = {**self.params, "batches": self.batches}
+        if adr_ids:
+            params["adr_id"] = list(adr_ids)
+        url = f"{self.url.rstrip('/')}/{self.upload_id}/complete"
+        r = self.session.post(url, params=params, timeout=self.timeout)
+        if r.status_code != 200:
+            raise UploadError(f"completing upload failed: {r.status_code} {r.text}")
+        return r.json()["resolved"]
+
+
+def _annotation(v: dict) -> dict:
+    return {
+        "path":             v["file"],
+        "start_line":       v["line"] or 1,
+        "end_line":         v["line"] or 1,
+        "annotation_level": "failure" if v.get("severity","error")=="error" else "warning",
+        "message":          f"[{v['adr_id']}] {v['message']}"
+    }
+
+
+def _tee_annotations(violations, fh):
+    """
+    Pass violations through while writing their GitHub annotations as a JSON
+    array to `fh`.
+    """
+    fh.write("[")
+    for i, v in enumerate(violations):
+        fh.write((",\n" if i else "\n") + json.dumps(_annotation(v), indent=2))
+        yield v
+    fh.write("\n]\n")
+
+
+def _complete_run(uploader: BatchUploader, adr_ids, timings: Timings = None):
+    try:
+        with timings.stage("complete") if timings else nullcontext():
+            resolved = uploader.complete(adr_ids)
+    except (requests.RequestException, UploadError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"→ Marked run complete; {resolved} violation(s) no longer reported were resolved.")
+
+
 def main():
     args = parse_args()
 
-    manifest_map = load_manifest(args.manifest_url, args.repo)
-    all_violations = []
     for sarif_path in args.sarif:
+        if sarif_path != "-" and not os.path.isfile(sarif_path):
+            print(f"ERROR: SARIF file not found: {sarif_path}", file=sys.stderr)
+            sys.exit(1)
 
-            try:
-                items = parse_sarif(sarif_path)
-            except FileNotFoundError:
-                print(f"ERROR: SARIF file not found: {sarif_path}", file=sys.stderr)
-                sys.exit(1)
-            except json.JSONDecodeError:
-                print(f"ERROR: Failed to parse SARIF (invalid JSON): {sarif_path}", file=sys.stderr)
-                sys.exit(1)
-
-            # 2) Convert to Packmind “violation” objects using the manifest map
-            violations = []
-            for it in items:
-                key = (it["tool"], it["rule"])
-                adr_id = manifest_map.get(key)
-                if not adr_id:
-                    print(f"⚠️  No ADR mapping for {key}, skipping: file={it['file']}, line={it['line']}")  
-                    continue
-                violations.append({
-                    "adr_id":  adr_id,
-                    "file":    it["file"],
-                    "line":    it["line"],
-                    "message": it["msg"],
-                })
-            print(f"Loaded {len(violations)} violation(s) from {sarif_path}")
-            all_violations.extend(violations)
-
-    if not all_violations:
-        print("→ No violations found in any SARIF (after manifest mapping). Exiting.")
-        sys.exit(0)
-
-    # Build payload
-    payload = {"violations": all_violations}
+    timings = Timings() if args.timings else None
+    with timings.stage("manifest") if timings else nullcontext():
+        manifest_map = load_manifest(
+            args.manifest_url,
+            args.repo,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            manifest_file=args.manifest_file,
+            timeout=args.manifest_timeout,
+        )
+    # Worker processes cannot read our stdin, so `-` keeps the serial path
+    if args.jobs > 1 and len(args.sarif) > 1 and "-" not in args.sarif:
+        violations = iter_violations_parallel(args.sarif, manifest_map, args.jobs, args.verbose, timings)
+    else:
+        violations = iter_violations(args.sarif, manifest_map, args.verbose, timings)
 
-    # Upload to Packmind
-    print(f"→ Uploading {len(all_violations)} violation(s) to {args.upload_url} …")
-    r = requests.post(
+    uploader = BatchUploader(
         args.upload_url,
-        json=payload,
-        headers={"Content-Type": "application/json"},
+        args.repo,
+        args.commit,
+        args.upload_id,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        compress=not args.no_gzip,
     )
-    if r.status_code != 200:
-        print(f"ERROR: Upload failed: {r.status_code} {r.text}", file=sys.stderr)
-        sys.exit(1)
 
-    print("→ Successfully uploaded all violations.")
-
-    # ─── Build GitHub annotations ─────────────────────────────────────────────
-    annotations = []
-    for v in all_violations:
-        annotations.append({
-            "path":             v["file"],
-            "start_line":       v["line"] or 1,
-            "end_line":         v["line"] or 1,
-            "annotation_level": "failure" if v.get("severity","error")=="error" else "warning",
-            "message":          f"[{v['adr_id']}] {v['message']}"
-        })
+    # Peek so that an empty result set never reaches the server
+    try:
+        first = next(violations, None)
+    except SarifError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    if first is None:
+        print("→ No violations found in any SARIF (after manifest mapping).")
+        # A clean full run still resolves everything that was open
+        if args.full_run is not None:
+            _complete_run(uploader, args.full_run, timings)
+        if timings:
+            timings.report(0)
+        sys.exit(0)
+    violations = itertools.chain([first], violations)
 
-    # ─── Optionally dump to the --output file ──────────────────────────────────
+    # ─── Optionally tee GitHub annotations into the --output file ────────────
+    out_fh = None
+    tmp_output = None
     if args.output:
+        tmp_output = args.output + ".tmp"
         try:
-            with open(args.output, "w", encoding="utf-8") as outf:
-                json.dump(annotations, outf, indent=2)
-            print(f"→ Wrote {len(annotations)} annotations to {args.output}")
+            out_fh = open(tmp_output, "w", encoding="utf-8")
         except Exception as e:
             print(f"ERROR: failed to write annotations to {args.output}: {e}", file=sys.stderr)
             sys.exit(1)
+        violations = _tee_annotations(violations, out_fh)
+
+    # Upload to Packmind in batches as the reports are parsed
+    print(f"→ Uploading violations to {args.upload_url} (upload id {args.upload_id}) …")
+    try:
+        with timings.stage("upload") if timings else nullcontext():
+            uploaded = uploader.upload(violations, args.batch_size)
+    except (SarifError, UploadError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        if out_fh is not None:
+            out_fh.close()
+            os.remove(tmp_output)
+        sys.exit(1)
+    if out_fh is not None:
+        out_fh.close()
+
+    print(f"→ Successfully uploaded {uploaded} violation(s).")
+    if args.full_run is not None:
+        _complete_run(uploader, args.full_run, timings)
+
+    if args.output:
+        os.replace(tmp_output, args.output)
+        print(f"→ Wrote {uploaded} annotations to {args.output}")
+    if timings:
+        timings.report(uploaded)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,4 @@
 import { useEffect, useState } from "react";
-import YAML from "js-yaml";
 import ReactMarkdown from "react-markdown";
 import { DashboardPage } from "./pages/DashboardPage";
 import "./App.css";
@@ -32,12 +31,18 @@ interface AdrContent {
 }
 
 interface Violation {
+  id:      number;
   adr_id:  string;
   file:    string;
   line:    number;
   message: string;
 }
 
+interface ViolationChange extends Violation {
+  seq:    number;
+  status: "open" | "resolved";
+}
+
 export default function App() {
   // ─────────────────────────── State ───────────────────────────
   const [manifest, setManifest]         = useState<ManifestRule[]>([]);
@@ -59,6 +64,7 @@ export default function App() {
   const MANIFEST_URL   = `${API_BASE_URL}/manifest/${REPO_KEY}`;
   const ADR_URL_BASE   = `${API_BASE_URL}/adr/`;
   const VIOLATIONS_URL = `${API_BASE_URL}/api/violations/${REPO_KEY}`;
+  const STREAM_URL     = `${API_BASE_URL}/api/stream/${REPO_KEY}`;
 
 
   // ─────────────────────────── Fetch manifest on mount ───────────────────────────
@@ -102,19 +108,12 @@ useEffect(() => {
         if (!res.ok) throw new Error("ADR not found");
         return res.json();
       })
-      .then((data: { content: string }) => {
-        const raw: string = data.content;
-        const parts = raw.split("---");
-        if (parts.length < 3) {
-          throw new Error("ADR frontmatter missing or malformed");
-        }
-        const yamlText = parts[1];
-        const mdText   = parts.slice(2).join("---").trim();
-
-        const fm = YAML.load(yamlText) as any;
+      .then((data: { content: string; frontmatter: AdrFrontmatter; body: string }) => {
+        // The server hands back front matter and body already split, so the
+        // browser no longer re-parses YAML on every ADR click.
         setAdrData({
-          frontmatter: fm as AdrFrontmatter,
-          contextMarkdown: mdText,
+          frontmatter: data.frontmatter,
+          contextMarkdown: data.body.trim(),
         });
       })
       .catch((err) => {
@@ -124,34 +123,75 @@ useEffect(() => {
       .finally(() => setLoadingAdr(false));
   }, [selectedAdr]);
 
-  // ─────────────────────────── Poll for live violations every 5s ───────────────────────────
+  // ─────────────────────────── Live violations: initial pages + change feed ──────────────────────────
+  // Load all of the selected ADR's violations page by page, then follow the
+  // server's SSE change feed. Nothing is transferred between uploads except
+  // the occasional keep-alive.
   useEffect(() => {
-    let intervalId: number;
-    const fetchViolations = () => {
-      fetch(VIOLATIONS_URL)
-        .then((res) => {
-          if (!res.ok) throw new Error("Failed to fetch violations");
-          return res.json();
-        })
-        .then((data: { violations: Violation[] }) => {
-          if (Array.isArray(data.violations)) {
-            setViolations(data.violations);
-            setViolationsError(null);
-          }
-        })
-        .catch((err) => {
-          console.error("Error fetching violations:", err);
-          setViolationsError("Could not load violations");
+    // Never show the previous ADR's violations while the new ones load
+    setViolations([]);
+    setViolationsError(null);
+    if (!selectedAdr || selectedAdr === "dashboard") return;
+
+    let source: EventSource | null = null;
+    let cancelled = false;
+    // Follow `next_cursor` until the last page; the feed then starts from
+    // the first page's cursor, which was taken before any page was read.
+    const loadAll = async () => {
+      const all: Violation[] = [];
+      let cursor: number | null = null;
+      let after: number | null = null;
+      do {
+        const params = new URLSearchParams({
+          adr_id: selectedAdr,
+          fields: "id,adr_id,file,line,message",
+          limit:  "500",
         });
+        if (after !== null) params.set("after", String(after));
+        const res = await fetch(`${VIOLATIONS_URL}?${params}`);
+        if (!res.ok) throw new Error("Failed to fetch violations");
+        const page: { violations: Violation[]; next_cursor: number | null; cursor: number } = await res.json();
+        if (cursor === null) cursor = page.cursor;
+        all.push(...page.violations);
+        after = page.next_cursor;
+      } while (after !== null && !cancelled);
+      return { violations: all, cursor: cursor as number };
     };
 
-    fetchViolations();
-    intervalId = window.setInterval(fetchViolations, 5000);
-    return () => window.clearInterval(intervalId);
-  }, []);
+    loadAll()
+      .then((data) => {
+        if (cancelled) return;
+        setViolations(data.violations);
+        setViolationsError(null);
+
+        const streamParams = new URLSearchParams({
+          adr_id: selectedAdr,
+          since:  String(data.cursor),
+        });
+        source = new EventSource(`${STREAM_URL}?${streamParams}`);
+        source.addEventListener("violations", (ev) => {
+          const changes: ViolationChange[] = JSON.parse((ev as MessageEvent).data);
+          setViolations((prev) => {
+            const byId = new Map(prev.map((v) => [v.id, v]));
+            for (const c of changes) {
+              if (c.status === "resolved") byId.delete(c.id);
+              else byId.set(c.id, c);
+            }
+            return Array.from(byId.values());
+          });
+        });
+        source.onerror = () => console.warn("Violation stream interrupted, reconnecting…");
+      })
+      .catch((err) => {
+        console.error("Error fetching violations:", err);
+        setViolationsError("Could not load violations");
+      });
 
-  // ─────────────────────────── Filter violations for the selected ADR ───────────────────────────
-  const filteredViolations = violations.filter((v) => v.adr_id === selectedAdr);
+    return () => {
+      cancelled = true;
+      source?.close();
+    };
+  }, [selectedAdr]);
 
   // ─────────────────────────── Render ───────────────────────────
   return (
@@ -247,12 +287,12 @@ useEffect(() => {
                 {violationsError && (
                   <p className="error-text">{violationsError}</p>
                 )}
-                {!violationsError && filteredViolations.length === 0 ? (
+                {!violationsError && violations.length === 0 ? (
                   <p className="placeholder">No violations reported.</p>
                 ) : (
                   <ul className="violation-list">
-                    {filteredViolations.map((v, idx) => (
-                      <li key={idx} className="violation-item">
+                    {violations.map((v) => (
+                      <li key={v.id} className="violation-item">
                         <div>
                           <strong>ADR:</strong> {v.adr_id}
                         </div>
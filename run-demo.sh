@@ -17,27 +17,26 @@ pushd apps/vanilla > /dev/null
 # 1a) Clean and run tests. We expect tests to fail, but we proceed anyway.
 ./gradlew clean test || echo "⚠️  ArchUnit tests failed (expected) – continuing..."
 
-# 1b) Capture the local JUnit XML filename under apps/vanilla/build/test-results/test/
-LOCAL_XML="$(ls build/test-results/test/*.xml | head -n1)"
-if [[ -z "$LOCAL_XML" ]] || [[ ! -f "$LOCAL_XML" ]]; then
+# 1b) Make sure the JUnit XML reports exist under apps/vanilla/build/test-results/test/
+if ! ls build/test-results/test/*.xml > /dev/null 2>&1; then
   echo "❌ ERROR: JUnit XML not found under apps/vanilla/build/test-results/test/"
   popd > /dev/null
   exit 1
 fi
-echo "✅ Found JUnit XML (inside apps/vanilla): $LOCAL_XML"
+echo "✅ Found $(ls build/test-results/test/*.xml | wc -l | tr -d ' ') JUnit XML file(s) (inside apps/vanilla)"
 
 popd > /dev/null
 
 # Construct a path relative to the repo root
-XML_REPORT_REL="apps/vanilla/${LOCAL_XML}"
+XML_REPORT_DIR="apps/vanilla/build/test-results/test"
 
 
 echo
 echo "=== 2/3: Converting JUnit XML to SARIF ==="
 SARIF_OUT="report_archunit.sarif"
 
-# Call the converter from the repo root, using the repo-relative path
-python3 xml2sarif.py "$XML_REPORT_REL" "$SARIF_OUT"
+# Convert every test class's report, not just the first one
+python3 xml2sarif.py "$XML_REPORT_DIR" "$SARIF_OUT"
 echo "✅ Generated SARIF file: $SARIF_OUT"
 
 
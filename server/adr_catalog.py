@@ -0,0 +1,353 @@
+"""
+In-memory ADR catalog backed by a persistent file index.
+
+The catalog keeps one entry per markdown file in the ADR directory, keyed by
+path and remembered by (mtime, size, sha256). A refresh only stats the
+directory; files are re-read when their stat changes and re-parsed only when
+their content hash differs. The index is mirrored into SQLite (`adr_file` +
+`adr`) so a restarted worker does not need to re-parse an unchanged catalog;
+index writes go through the database's single writer thread.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+
+import yaml
+
+from . import metrics
+from .db import Database
+from .log import get_logger
+
+log = get_logger("adr_catalog")
+
+
+@dataclass
+class AdrEntry:
+    path:     str
+    mtime_ns: int
+    size:     int
+    sha256:   str
+    # Parsed front matter; None when the file has no (valid) front matter.
+    front:    Optional[dict] = None
+    rule:     Optional[dict] = field(default=None, repr=False)
+    # Raw document and its markdown body; loaded lazily for index-seeded entries.
+    content:  Optional[str] = field(default=None, repr=False)
+    body:     Optional[str] = field(default=None, repr=False)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha256[:32]}"'
+
+
+def split_front_matter(text: str):
+    """
+    Split an ADR document into (front-matter dict, markdown body).
+    Returns None when the document has no YAML front matter.
+    """
+    if not text.startswith("---"):
+        return None
+    parts = text.split("---", 2)
+    if len(parts) < 3:
+        return None
+    data = yaml.safe_load(parts[1])
+    if not isinstance(data, dict):
+        return None
+    return data, parts[2]
+
+
+def _rule_from_front(front: dict) -> dict:
+    enforcement = front.get("enforcement") or {}
+    return {
+        "id":       front.get("id"),
+        "tool":     enforcement.get("tool"),
+        "rule_id":  enforcement.get("rule_id"),
+        "severity": enforcement.get("severity"),
+    }
+
+
+class AdrCatalog:
+    """
+    Incrementally maintained view of the ADR directory.
+
+    `ensure_fresh()` is cheap to call on every request: it rescans at most
+    once per `rescan_interval` seconds, and not at all while a filesystem
+    watcher is running (the watcher triggers `refresh()` itself).
+    """
+
+    def __init__(
+        self,
+        adr_dir: str,
+        repo: str,
+        db: Database,
+        rescan_interval: float = 5.0,
+    ):
+        self.adr_dir = adr_dir
+        self.repo = repo
+        self.rescan_interval = rescan_interval
+        self._db = db
+        self._lock = threading.RLock()
+        self._entries: Dict[str, AdrEntry] = {}
+        self._rules: List[dict] = []
+        self._by_id: Dict[str, AdrEntry] = {}
+        self._last_scan = 0.0
+        self._watcher: Optional[threading.Thread] = None
+        self.version = ""
+
+    # ─── Persistence ──────────────────────────────────────────────────────
+    def load_index(self):
+        """
+        Seed the in-memory catalog from the persisted file index, so that the
+        first refresh after a restart only re-reads files that changed.
+        """
+        with self._db.read() as conn:
+            rows = conn.execute(
+                """
+                SELECT f.path, f.mtime_ns, f.size, f.sha256,
+                       a.id, a.title, a.tool, a.rule_id, a.severity
+                FROM adr_file f
+                LEFT JOIN adr a ON a.id = f.adr_id
+                """
+            ).fetchall()
+
+        with self._lock:
+            self._entries.clear()
+            for path, mtime_ns, size, sha, adr_id, title, tool, rule_id, severity in rows:
+                front = None
+                if adr_id is not None:
+                    front = {
+                        "id": adr_id,
+                        "title": title,
+                        "enforcement": {"tool": tool, "rule_id": rule_id, "severity": severity},
+                    }
+                self._entries[path] = AdrEntry(path, mtime_ns, size, sha, front)
+            self._rebuild()
+
+    def _persist(self, upserts: List[AdrEntry], removed: List[AdrEntry], stale_ids: List[str]):
+        """
+        Queue the index write without waiting for it: the writer may be busy
+        with an ingest transaction, and manifest reads must not stall behind
+        it. Entries are copied because later refreshes update them in place.
+        Called under `_lock`, which only orders the queued writes; enqueueing
+        never blocks.
+        """
+        future = self._db.submit(self._write_index, [replace(e) for e in upserts], removed, stale_ids)
+        future.add_done_callback(self._index_written)
+
+    @staticmethod
+    def _index_written(future: Future):
+        error = future.exception()
+        if error is not None:
+            log.error("failed to persist ADR index", extra={"error": repr(error)})
+
+    def _write_index(
+        self,
+        conn: sqlite3.Connection,
+        upserts: List[AdrEntry],
+        removed: List[AdrEntry],
+        stale_ids: List[str],
+    ):
+        with conn:
+            stale_ids = stale_ids + [e.front.get("id") for e in removed if e.front]
+            conn.executemany("DELETE FROM adr WHERE id = ?", [(i,) for i in stale_ids])
+            conn.executemany(
+                "DELETE FROM adr_file WHERE path = ?", [(e.path,) for e in removed]
+            )
+            conn.executemany(
+                """
+                REPLACE INTO adr_file (path, mtime_ns, size, sha256, adr_id)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (e.path, e.mtime_ns, e.size, e.sha256, e.front.get("id") if e.front else None)
+                    for e in upserts
+                ],
+            )
+            conn.executemany(
+                """
+                REPLACE INTO adr (id, title, repo, tool, rule_id, severity)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        e.rule["id"],
+                        e.front.get("title"),
+                        self.repo,
+                        e.rule["tool"],
+                        e.rule["rule_id"],
+                        e.rule["severity"],
+                    )
+                    for e in upserts
+                    if e.front
+                ],
+            )
+
+    # ─── Scanning ─────────────────────────────────────────────────────────
+    def _scan(self) -> Dict[str, os.stat_result]:
+        found = {}
+        if not os.path.isdir(self.adr_dir):
+            return found
+        with os.scandir(self.adr_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".md") and entry.is_file():
+                    found[entry.path] = entry.stat()
+        return found
+
+    def _read(self, path: str, st: os.stat_result) -> AdrEntry:
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        entry = AdrEntry(path, st.st_mtime_ns, st.st_size, hashlib.sha256(raw).hexdigest())
+        try:
+            text = raw.decode("utf-8")
+            parsed = split_front_matter(text)
+        except Exception as e:
+            log.warning("failed to load ADR", extra={"file": os.path.basename(path), "error": str(e)})
+            parsed = None
+        if parsed:
+            entry.front, entry.body = parsed
+            entry.content = text
+        return entry
+
+    def refresh(self, if_due: bool = False) -> bool:
+        """
+        Reconcile the catalog with the ADR directory. Returns True when the
+        set of parsed documents changed. With `if_due`, callers that raced
+        for the same rescan find it already done once they get the lock.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if if_due and not self.needs_refresh():
+                return False
+            on_disk = self._scan()
+            upserts: List[AdrEntry] = []
+            stale_ids: List[str] = []
+            changed = False
+            unchanged = touched = 0
+
+            for path, st in on_disk.items():
+                cur = self._entries.get(path)
+                if cur and cur.mtime_ns == st.st_mtime_ns and cur.size == st.st_size:
+                    unchanged += 1
+                    continue
+                new = self._read(path, st)
+                if cur and cur.sha256 == new.sha256:
+                    # Touched but identical: only the stat needs recording.
+                    cur.mtime_ns, cur.size = new.mtime_ns, new.size
+                    upserts.append(cur)
+                    touched += 1
+                    continue
+                if cur and cur.front:
+                    # The old id may disappear if the front matter changed.
+                    old_id = cur.front.get("id")
+                    if not new.front or new.front.get("id") != old_id:
+                        stale_ids.append(old_id)
+                self._entries[path] = new
+                upserts.append(new)
+                changed = True
+
+            removed = [self._entries.pop(p) for p in list(self._entries) if p not in on_disk]
+            changed = changed or bool(removed)
+
+            if changed:
+                self._rebuild()
+            if upserts or removed:
+                self._persist(upserts, removed, stale_ids)
+            self._last_scan = time.monotonic()
+
+        elapsed = time.perf_counter() - start
+        parsed = len(on_disk) - unchanged - touched
+        metrics.adr_refresh.observe(elapsed, "true" if changed else "false")
+        metrics.adr_files.inc("unchanged", amount=unchanged)
+        metrics.adr_files.inc("touched", amount=touched)
+        metrics.adr_files.inc("parsed", amount=parsed)
+        if changed:
+            log.info(
+                "ADR catalog reloaded",
+                extra={"version": self.version, "parsed": parsed, "removed": len(removed), "seconds": round(elapsed, 4)},
+            )
+        return changed
+
+    def _rebuild(self):
+        rules = []
+        by_id = {}
+        for entry in sorted(self._entries.values(), key=lambda e: e.path):
+            if entry.front:
+                entry.rule = _rule_from_front(entry.front)
+                rules.append(entry.rule)
+                by_id.setdefault(entry.rule["id"], entry)
+        digest = hashlib.sha256()
+        for entry in sorted(self._entries.values(), key=lambda e: e.path):
+            digest.update(f"{entry.path}\0{entry.sha256}\n".encode())
+        self._rules = rules
+        self._by_id = by_id
+        self.version = digest.hexdigest()[:16]
+
+    def needs_refresh(self) -> bool:
+        if self._watcher is not None and self._watcher.is_alive():
+            return False
+        return time.monotonic() - self._last_scan >= self.rescan_interval
+
+    def ensure_fresh(self):
+        if self.needs_refresh():
+            self.refresh(if_due=True)
+
+    # ─── Accessors ────────────────────────────────────────────────────────
+    def rules(self) -> List[dict]:
+        return self._rules
+
+    def get(self, adr_id: str) -> Optional[AdrEntry]:
+        """
+        Look up a parsed ADR by its front-matter id. Entries seeded from the
+        persisted index only carry the manifest fields, so their document is
+        read on first access; if it no longer matches the indexed hash the
+        catalog is refreshed instead.
+        """
+        with self._lock:
+            entry = self._by_id.get(adr_id)
+            if entry is None or entry.content is not None:
+                return entry
+            try:
+                with open(entry.path, "rb") as fh:
+                    raw = fh.read()
+            except OSError:
+                raw = None
+            if raw is not None and hashlib.sha256(raw).hexdigest() == entry.sha256:
+                text = raw.decode("utf-8")
+                parsed = split_front_matter(text)
+                if parsed:
+                    entry.front, entry.body = parsed
+                    entry.content = text
+                    return entry
+            # Changed behind our back: reconcile and retry from fresh state.
+            entry.mtime_ns = -1
+            self.refresh()
+            return self._by_id.get(adr_id)
+
+    # ─── Optional filesystem watch ────────────────────────────────────────
+    def start_watching(self) -> bool:
+        """
+        Refresh on filesystem events instead of polling. Requires the optional
+        `watchfiles` package (shipped with `uvicorn[standard]`).
+        """
+        try:
+            from watchfiles import watch
+        except ImportError:
+            log.warning("watchfiles not installed; falling back to periodic ADR rescans")
+            return False
+        if not os.path.isdir(self.adr_dir):
+            return False
+
+        def run():
+            for _changes in watch(self.adr_dir):
+                try:
+                    self.refresh()
+                except Exception:
+                    log.exception("ADR catalog refresh failed")
+
+        self._watcher = threading.Thread(target=run, name="adr-watch", daemon=True)
+        self._watcher.start()
+        return True
@@ -1,19 +1,38 @@
+import asyncio
+import json
 import os
 import sqlite3
-import yaml
-from typing import List
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+import threading
+import uuid
+import zlib
+from datetime import datetime
+from email.utils import formatdate
+from typing import Dict, Optional, Set, Tuple
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from pathlib import Path
-from starlette.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "packmind.db")
+from . import metrics
+from .adr_catalog import AdrCatalog
+from .db import Database
+from .log import configure_logging, get_logger, shutdown_logging
+from .violations import DEFAULT_FIELDS, FIELDS as VIOLATION_FIELDS, STATUSES, BatchConflict, ViolationStore, batch_digest
+
+DB_PATH = os.getenv("DB_PATH") or os.path.join(os.path.dirname(__file__), "packmind.db")
 REPO_NAME = os.getenv("REPO_NAME", "org/repo")
-ADR_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "docs", "adr"))
+# Upper bound on an upload body after gunzipping; larger bodies get a 413
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+ADR_DIR = os.getenv("ADR_DIR") or os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "docs", "adr"))
+
+log = get_logger("app")
 
 app = FastAPI(title="Packmind Lite")
+app.add_middleware(metrics.MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://packmind-frontend.onrender.com"],  # your frontend URL
@@ -22,25 +41,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory list to hold uploaded violations
-in_memory_violations: List[dict] = []
-
 class Violation(BaseModel):
     adr_id:  str
     file:    str
     line:    int
     message: str
+    # Source snippet or tool line hash; replaces the line in the fingerprint
+    context: Optional[str] = None
 
 class UploadPayload(BaseModel):
     violations: list[Violation]
+    repo:       str = REPO_NAME
+    commit:     Optional[str] = None
 
 
-def init_db():
-    """
-    Create the `adr` table if it doesn’t exist yet.
-    """
-    conn = sqlite3.connect(DB_PATH)
+def _create_schema(conn: sqlite3.Connection):
     cur = conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS adr (
@@ -53,152 +70,627 @@ def init_db():
         )
         """
     )
+    # Stat/hash index of the ADR files, so unchanged files are never re-parsed
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS adr_file (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            size INTEGER,
+            sha256 TEXT,
+            adr_id TEXT
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS violation (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            repo TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            adr_id TEXT NOT NULL,
+            file TEXT NOT NULL,
+            line INTEGER,
+            message TEXT,
+            severity TEXT,
+            commit_sha TEXT,
+            upload_id TEXT,
+            last_upload_id TEXT,
+            created_at REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            occurrences INTEGER NOT NULL DEFAULT 1,
+            resolved_at REAL,
+            seq INTEGER NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_violation_fingerprint ON violation (repo, fingerprint)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_violation_repo_adr ON violation (repo, adr_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_violation_repo_file ON violation (repo, file)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_violation_repo_seq ON violation (repo, seq)")
+    # One row per ingested upload batch, used to acknowledge replays. Tables
+    # from before batches were keyed per repo and hashed are only replay
+    # bookkeeping, so they are simply recreated.
+    columns = [r[1] for r in cur.execute("PRAGMA table_info(upload_batch)")]
+    if columns and "digest" not in columns:
+        cur.execute("DROP TABLE upload_batch")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS upload_batch (
+            repo TEXT NOT NULL,
+            upload_id TEXT NOT NULL,
+            batch INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (repo, upload_id, batch)
+        )
+        """
+    )
+    # Open-violation counts per ADR and per file plus a daily opened/resolved
+    # trend, kept current by the triggers below so /api/summary never scans
+    # the violation table.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS violation_by_adr (
+            repo TEXT NOT NULL,
+            adr_id TEXT NOT NULL,
+            open INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (repo, adr_id)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS violation_by_file (
+            repo TEXT NOT NULL,
+            file TEXT NOT NULL,
+            open INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (repo, file)
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_violation_by_file_open ON violation_by_file (repo, open)")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS violation_daily (
+            repo TEXT NOT NULL,
+            day TEXT NOT NULL,
+            opened INTEGER NOT NULL DEFAULT 0,
+            resolved INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (repo, day)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tr_violation_opened AFTER INSERT ON violation
+        WHEN NEW.resolved_at IS NULL
+        BEGIN
+            INSERT INTO violation_by_adr (repo, adr_id, open, total) VALUES (NEW.repo, NEW.adr_id, 1, 1)
+                ON CONFLICT (repo, adr_id) DO UPDATE SET open = open + 1, total = total + 1;
+            INSERT INTO violation_by_file (repo, file, open) VALUES (NEW.repo, NEW.file, 1)
+                ON CONFLICT (repo, file) DO UPDATE SET open = open + 1;
+            INSERT INTO violation_daily (repo, day, opened) VALUES (NEW.repo, date(NEW.created_at, 'unixepoch'), 1)
+                ON CONFLICT (repo, day) DO UPDATE SET opened = opened + 1;
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tr_violation_resolved AFTER UPDATE OF resolved_at ON violation
+        WHEN OLD.resolved_at IS NULL AND NEW.resolved_at IS NOT NULL
+        BEGIN
+            UPDATE violation_by_adr SET open = open - 1 WHERE repo = NEW.repo AND adr_id = NEW.adr_id;
+            UPDATE violation_by_file SET open = open - 1 WHERE repo = NEW.repo AND file = NEW.file;
+            INSERT INTO violation_daily (repo, day, resolved) VALUES (NEW.repo, date(NEW.resolved_at, 'unixepoch'), 1)
+                ON CONFLICT (repo, day) DO UPDATE SET resolved = resolved + 1;
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tr_violation_reopened AFTER UPDATE OF resolved_at ON violation
+        WHEN OLD.resolved_at IS NOT NULL AND NEW.resolved_at IS NULL
+        BEGIN
+            UPDATE violation_by_adr SET open = open + 1 WHERE repo = NEW.repo AND adr_id = NEW.adr_id;
+            UPDATE violation_by_file SET open = open + 1 WHERE repo = NEW.repo AND file = NEW.file;
+            INSERT INTO violation_daily (repo, day, opened) VALUES (NEW.repo, date(NEW.last_seen, 'unixepoch'), 1)
+                ON CONFLICT (repo, day) DO UPDATE SET opened = opened + 1;
+        END
+        """
+    )
     conn.commit()
-    conn.close()
 
 
-def load_adrs(repo: str, adr_dir: str):
-    """
-    1) DELETE all existing rows for this repo
-    2) Re-scan adr_dir for .md files
-    3) REPLACE INTO adr (exactly what’s on disk)
-    """
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+# Pooled readers plus a single writer thread (see db.py)
+db = Database(DB_PATH, pool_size=int(os.getenv("DB_POOL_SIZE", "8")))
+metrics.REGISTRY.register(metrics.Gauge(
+    "packmind_db_pending_writes", "Writes queued for the database writer thread.",
+    lambda: [((), db.pending_writes)],
+))
 
-    # 1) Remove all existing rows for this repo
-    cur.execute("DELETE FROM adr WHERE repo = ?", (repo,))
 
-    # 2) If the directory doesn’t exist, bail
-    if not os.path.isdir(adr_dir):
-        conn.commit()
-        conn.close()
-        return
+def init_db():
+    """
+    Create the `adr`, `adr_file` and `violation` tables if they don’t exist
+    yet, and switch the database to WAL so readers never wait on ingest.
+    """
+    db.write(_create_schema)
 
-    # 3) For each .md file in docs/adr, parse front-matter and insert
-    for fname in os.listdir(adr_dir):
-        if not fname.endswith(".md"):
-            continue
-        path = os.path.join(adr_dir, fname)
-        with open(path, "r", encoding="utf-8") as fh:
-            text = fh.read()
-        if not text.startswith("---"):
-            continue
-        try:
-            parts = text.split("---", 2)
-            front = parts[1]
-            data = yaml.safe_load(front)
-            enforcement = data.get("enforcement", {})
-            cur.execute(
-                """
-                REPLACE INTO adr (id, title, repo, tool, rule_id, severity)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    data.get("id"),
-                    data.get("title"),
-                    repo,
-                    enforcement.get("tool"),
-                    enforcement.get("rule_id"),
-                    enforcement.get("severity"),
-                ),
-            )
-        except Exception as e:
-            print(f"Failed to load {fname}: {e}")
 
-    conn.commit()
-    conn.close()
+# Shared, incrementally maintained ADR catalog (see adr_catalog.py)
+catalog = AdrCatalog(
+    ADR_DIR,
+    repo=REPO_NAME,
+    db=db,
+    rescan_interval=float(os.getenv("ADR_RESCAN_SECONDS", "5")),
+)
+store = ViolationStore(db)
 
 
 @app.on_event("startup")
 def startup_event():
     """
-    Ensure the database exists. We do NOT pre-load ADRs here;
-    instead we rebuild on each /manifest call.
+    Ensure the database exists, seed the ADR catalog from its persisted index
+    and reconcile it with what is on disk. Afterwards the catalog is only
+    refreshed when the ADR directory changes (watcher, periodic stat scan or
+    an explicit /admin/reload).
     """
+    configure_logging()
     init_db()
+    catalog.load_index()
+    catalog.refresh()
+    if os.getenv("ADR_WATCH") == "1":
+        catalog.start_watching()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    db.close()
+    shutdown_logging()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus scrape endpoint for this worker's metrics.
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/manifest/{repo:path}")
-def get_manifest(repo: str):
+async def get_manifest(repo: str, if_none_match: Optional[str] = Header(default=None)):
     """
-    Rebuild ADRs from disk, then return them.
+    Return the ADR rules, served from the in-memory catalog. The catalog
+    version doubles as the ETag, so clients revalidating with
+    `If-None-Match` get a 304 until an ADR changes. Runs on the event loop;
+    only a due rescan is handed to the thread pool.
     """
-    load_adrs(repo, ADR_DIR)
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    rows = cur.execute(
-        "SELECT id, tool, rule_id, severity FROM adr WHERE repo = ?", (repo,)
-    ).fetchall()
-    conn.close()
+    if catalog.needs_refresh():
+        await run_in_threadpool(catalog.ensure_fresh)
+    etag = f'"{catalog.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        metrics.http_cache.inc("manifest", "hit")
+        return Response(status_code=304, headers=headers)
+    metrics.http_cache.inc("manifest", "miss")
+    return JSONResponse(
+        {"repo": repo, "version": catalog.version, "rules": catalog.rules()},
+        headers=headers,
+    )
 
-    rules = [
-        {"id": r[0], "tool": r[1], "rule_id": r[2], "severity": r[3]}
-        for r in rows
-    ]
-    return {"repo": repo, "rules": rules}
+
+@app.post("/admin/reload")
+def reload_adrs():
+    """
+    Force the ADR catalog to reconcile with the ADR directory right away.
+    """
+    changed = catalog.refresh()
+    return {"status": "ok", "changed": changed, "version": catalog.version, "count": len(catalog.rules())}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return any(t[2:] == etag if t.startswith("W/") else t == etag for t in candidates)
 
 
 @app.get("/adr/{adr_id}")
-def get_adr(adr_id: str):
+def get_adr(adr_id: str, if_none_match: Optional[str] = Header(default=None)):
     """
-    Return the full content of the ADR whose front-matter `id` matches `adr_id`.
+    Return the full content of the ADR whose front-matter `id` matches `adr_id`,
+    along with the parsed front matter and markdown body. Lookups hit the
+    in-memory catalog; clients revalidating with `If-None-Match` get a 304.
     """
-    if not os.path.isdir(ADR_DIR):
-        raise HTTPException(status_code=404, detail="ADR directory not found")
+    catalog.ensure_fresh()
+    entry = catalog.get(adr_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="ADR not found")
 
-    for fname in os.listdir(ADR_DIR):
-        if not fname.endswith(".md"):
-            continue
-        path = os.path.join(ADR_DIR, fname)
-        with open(path, "r", encoding="utf-8") as fh:
-            text = fh.read()
-        if text.startswith("---"):
-            try:
-                parts = text.split("---", 2)
-                data = yaml.safe_load(parts[1])
-                if data.get("id") == adr_id:
-                    return {"content": text}
-            except:
-                continue
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": formatdate(entry.mtime_ns / 1e9, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _etag_matches(if_none_match, entry.etag):
+        metrics.http_cache.inc("adr", "hit")
+        return Response(status_code=304, headers=headers)
+    metrics.http_cache.inc("adr", "miss")
+    return JSONResponse(
+        jsonable_encoder({"content": entry.content, "frontmatter": entry.front, "body": entry.body}),
+        headers=headers,
+    )
 
-    raise HTTPException(status_code=404, detail="ADR not found")
 
+async def _body_chunks(request: Request):
+    """
+    Yield the request body as it arrives, gunzipping on the fly when the
+    client sent `Content-Encoding: gzip`. Concatenated gzip members (pigz,
+    `cat a.gz b.gz`) are all decoded, and the decoded body may not exceed
+    MAX_UPLOAD_BYTES.
+    """
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    if encoding not in ("identity", "gzip"):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    too_large = HTTPException(status_code=413, detail=f"Upload body exceeds {MAX_UPLOAD_BYTES} bytes")
+    size = 0
+    if encoding == "identity":
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise too_large
+            yield chunk
+        return
 
-@app.post("/api/upload")
-def upload(payload: UploadPayload):
+    inflater = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    try:
+        async for chunk in request.stream():
+            while chunk:
+                # Bound each step so a small compressed chunk cannot inflate
+                # past the limit in one call
+                data = inflater.decompress(chunk, MAX_UPLOAD_BYTES - size + 1)
+                size += len(data)
+                if size > MAX_UPLOAD_BYTES:
+                    raise too_large
+                if data:
+                    yield data
+                if inflater.eof:
+                    # Start over on the next gzip member, if any
+                    chunk = inflater.unused_data
+                    if chunk:
+                        inflater = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+                else:
+                    chunk = inflater.unconsumed_tail
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    if not inflater.eof:
+        raise HTTPException(status_code=400, detail="Invalid gzip body: truncated stream")
+
+
+# Violations are validated this many at a time: one pydantic call over a
+# large body holds the GIL long enough to stall the event loop
+VALIDATE_CHUNK = 2000
+_violation_list = TypeAdapter(list[Violation])
+
+
+def _validate_violations(items: list) -> list:
+    violations = []
+    for start in range(0, len(items), VALIDATE_CHUNK):
+        try:
+            violations.extend(_violation_list.validate_python(items[start:start + VALIDATE_CHUNK]))
+        except ValidationError as e:
+            errors = e.errors(include_url=False)
+            for err in errors:
+                err["loc"] = ("violations", start + err["loc"][0], *err["loc"][1:])
+            raise RequestValidationError(errors)
+    return violations
+
+
+def _parse_violations(body: bytes, content_type: str, params) -> Tuple[list, str, Optional[str]]:
+    """
+    Parse an upload body into (violations, repo, commit). Accepts a JSON
+    `UploadPayload` or NDJSON with one violation per line (repo and commit
+    then come from the query string). CPU-bound; runs in the thread pool.
+    """
+    try:
+        if content_type == "application/x-ndjson":
+            violations = [Violation.model_validate_json(l) for l in body.split(b"\n") if l.strip()]
+            return violations, params.get("repo", REPO_NAME), params.get("commit")
+        try:
+            doc = json.loads(body)
+        except ValueError:
+            doc = None
+        if not isinstance(doc, dict) or not isinstance(doc.get("violations"), list):
+            # Malformed: let pydantic produce the usual error
+            payload = UploadPayload.model_validate_json(body)
+            return payload.violations, payload.repo, payload.commit
+        payload = UploadPayload.model_validate({**doc, "violations": []})
+        return _validate_violations(doc["violations"]), payload.repo, payload.commit
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+
+def _map_violations(violations: list) -> list:
     """
-    Accept incoming violations, append to in-memory list, and print them.
+    Turn parsed violations into store rows, taking severity from the catalog.
     """
-    for v in payload.violations:
-        in_memory_violations.append({
-            "adr_id":  v.adr_id,
-            "file":    v.file,
-            "line":    v.line,
-            "message": v.message
+    rules = {r["id"]: r for r in catalog.rules()}
+    rows = []
+    for v in violations:
+        rule = rules.get(v.adr_id) or {}
+        rows.append({
+            "adr_id":   v.adr_id,
+            "file":     v.file,
+            "line":     v.line,
+            "message":  v.message,
+            "context":  v.context,
+            "severity": rule.get("severity"),
         })
-        print(f"Violation for {v.adr_id} in {v.file}:{v.line} – {v.message}")
-    return {"status": "ok"}
+    return rows
 
 
-@app.get("/api/violations/{repo}")
-def get_violations(repo: str):
+@app.post("/api/upload")
+async def upload(
+    request: Request,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_batch_index: int = Header(default=0, ge=0),
+):
     """
-    Return all uploaded violations (ignoring `repo` for now).
+    Accept incoming violations and upsert them on their fingerprint in one
+    transaction, so re-uploading unchanged violations adds no rows. Severity
+    is taken from the ADR catalog at ingest time.
+
+    Bodies may be gzip-compressed JSON or NDJSON. A client splitting one run
+    into several batches sends the same `Idempotency-Key` with an
+    `X-Batch-Index` per batch; replayed batches are acknowledged but not
+    stored again. Batches are keyed per repo, and reusing a key and index
+    for different content is answered with a 409 instead of a replay.
     """
-    return {"violations": in_memory_violations}
+    # Receiving and gunzipping stay on the event loop; validation and mapping
+    # are CPU-bound and go to the thread pool so they never stall other requests
+    with metrics.ingest_stage.time("read"):
+        body = b"".join([chunk async for chunk in _body_chunks(request)])
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        violations, repo, commit = await run_in_threadpool(
+            _parse_violations, body, content_type, request.query_params
+        )
+    upload_id = idempotency_key or uuid.uuid4().hex
+    with metrics.ingest_stage.time("map"):
+        rows = await run_in_threadpool(_map_violations, violations)
+        digest = await run_in_threadpool(batch_digest, commit, rows)
+    with metrics.ingest_stage.time("store"):
+        try:
+            count, changed, duplicate = await store.insert_many_async(
+                repo, commit, upload_id, rows, x_batch_index, digest=digest
+            )
+        except BatchConflict as e:
+            metrics.upload_batches.inc("conflict")
+            raise HTTPException(status_code=409, detail=str(e))
+    metrics.upload_batches.inc("replay" if duplicate else "stored")
+    if not duplicate:
+        metrics.violations_ingested.inc(repo, amount=count)
+        metrics.violations_changed.inc(repo, amount=changed)
+        log.info(
+            "stored upload batch",
+            extra={
+                "sampled": True,
+                "repo": repo,
+                "upload_id": upload_id,
+                "batch": x_batch_index,
+                "count": count,
+                "changed": changed,
+            },
+        )
+        if changed:
+            notify_feed(repo)
+    return {
+        "status": "ok",
+        "upload_id": upload_id,
+        "batch": x_batch_index,
+        "count": count,
+        "changed": changed,
+        "duplicate": duplicate,
+    }
 
 
-# Serve the React static files under `/`
+@app.post("/api/upload/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    repo: str = REPO_NAME,
+    batches: int = Query(ge=0),
+    adr_id: Optional[list[str]] = Query(default=None),
+):
+    """
+    Mark upload `upload_id` as a full run of `repo`: open violations it did
+    not report are resolved. `batches` is the number of batches the client
+    sent; if the server has not stored all of them nothing is resolved and a
+    409 is returned. Repeat `adr_id` to limit the run to some ADRs.
+    """
+    resolved = await store.resolve_missing_async(repo, upload_id, batches, adr_id)
+    if resolved is None:
+        raise HTTPException(status_code=409, detail="Upload is incomplete; not all batches were stored")
+    if resolved:
+        metrics.violations_resolved.inc(repo, amount=resolved)
+        log.info("resolved violations missing from full run", extra={"repo": repo, "upload_id": upload_id, "resolved": resolved})
+        notify_feed(repo)
+    return {"status": "ok", "upload_id": upload_id, "resolved": resolved}
+
+
+@app.get("/api/violations/{repo:path}")
+def get_violations(
+    repo: str,
+    adr_id: Optional[str] = None,
+    file_prefix: Optional[str] = None,
+    severity: Optional[str] = None,
+    status: str = "open",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[int] = Query(default=None, ge=0),
+    limit: int = Query(default=500, ge=1, le=5000),
+    fields: Optional[str] = None,
+):
+    """
+    Return one page of `repo`'s violations, optionally filtered by ADR id,
+    file prefix, severity, status (`open`, `resolved` or `all`) and time
+    range. `fields` is a comma-separated projection. Pass `next_cursor` back as `after` to get the next page; it
+    is null on the last page.
+    """
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(DEFAULT_FIELDS)
+    if status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown status: {status}")
+    unknown = [f for f in wanted if f not in VIOLATION_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    # The cursor needs the id even when the client did not ask for it
+    selected = wanted if "id" in wanted else ["id"] + wanted
+
+    # Take the change-feed position before reading the page: a write landing
+    # in between is then also replayed by the feed (the UI merges by id)
+    # instead of falling between the page and the cursor.
+    cursor = store.head(repo)
+    rows = store.query(
+        repo,
+        adr_id=adr_id,
+        file_prefix=file_prefix,
+        severity=severity,
+        status=status,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        after=after,
+        limit=limit,
+        fields=selected,
+    )
+    next_cursor = rows[-1]["id"] if len(rows) == limit else None
+    if "id" not in wanted:
+        for r in rows:
+            del r["id"]
+    # Following the feed from `cursor` yields every change this page may miss
+    return {"violations": rows, "next_cursor": next_cursor, "cursor": cursor}
+
+
+@app.get("/api/summary/{repo:path}")
+def get_summary(
+    repo: str,
+    days: int = Query(default=30, ge=1, le=366),
+    top_files: int = Query(default=20, ge=1, le=500),
+):
+    """
+    Return `repo`'s open-violation counts per ADR and for its most affected
+    files, plus a daily opened/resolved trend. Served from aggregates kept
+    current at ingest, so it costs the same however many violations exist.
+    """
+    return store.summary(repo, days=days, top_files=top_files)
+
+
+# ─── Change feed ──────────────────────────────────────────────────────────
+# Streams wait on an asyncio.Event that this worker's uploads set; they also
+# wake every FEED_POLL_SECONDS to pick up uploads handled by other workers.
+FEED_POLL_SECONDS = float(os.getenv("FEED_POLL_SECONDS", "5"))
+FEED_KEEPALIVE_SECONDS = 15.0
+_feed_waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+_feed_lock = threading.Lock()
+metrics.REGISTRY.register(metrics.Gauge(
+    "packmind_feed_streams", "Open SSE change-feed streams.",
+    lambda: [((), sum(len(w) for w in _feed_waiters.values()))],
+))
+
+
+def notify_feed(repo: str):
+    """
+    Wake the SSE streams of `repo`. Safe to call from worker threads.
+    """
+    with _feed_lock:
+        waiters = list(_feed_waiters.get(repo, ()))
+    for loop, event in waiters:
+        loop.call_soon_threadsafe(event.set)
+
+
+@app.get("/api/changes/{repo:path}")
+def get_changes(
+    repo: str,
+    since: int = Query(default=0, ge=0),
+    adr_id: Optional[str] = None,
+    limit: int = Query(default=500, ge=1, le=5000),
+):
+    """
+    Return violations added or resolved after cursor `since`. Pass the
+    returned `cursor` back as `since`; `more` is true when another page is
+    ready right away.
+    """
+    rows = store.changes(repo, since, adr_id=adr_id, limit=limit)
+    cursor = rows[-1]["seq"] if rows else since
+    return {"changes": rows, "cursor": cursor, "more": len(rows) == limit}
+
+
+@app.get("/api/stream/{repo:path}")
+async def stream_changes(
+    repo: str,
+    request: Request,
+    since: int = Query(default=0, ge=0),
+    adr_id: Optional[str] = None,
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """
+    Server-Sent Events stream of the change feed. Each `violations` event
+    carries a batch of changes and uses the feed cursor as its event id, so
+    a reconnecting EventSource resumes where it left off.
+    """
+    cursor = int(last_event_id) if last_event_id and last_event_id.isdigit() else since
+    loop = asyncio.get_running_loop()
+    event = asyncio.Event()
+    waiter = (loop, event)
+    with _feed_lock:
+        _feed_waiters.setdefault(repo, set()).add(waiter)
+
+    async def events():
+        nonlocal cursor
+        last_sent = loop.time()
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event.clear()
+                rows = await run_in_threadpool(store.changes, repo, cursor, adr_id, 500)
+                if rows:
+                    cursor = rows[-1]["seq"]
+                    yield f"id: {cursor}\nevent: violations\ndata: {json.dumps(rows)}\n\n"
+                    last_sent = loop.time()
+                    continue
+                if loop.time() - last_sent >= FEED_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = loop.time()
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=FEED_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with _feed_lock:
+                _feed_waiters.get(repo, set()).discard(waiter)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Serve the React static files under `/`. The mount is optional: with
+# SERVE_UI=0 (API-only workers) it is skipped, and a missing build only
+# yields 404s instead of failing at import time.
 HERE = Path(__file__).resolve().parent            # /app/server
-UI_DIST = HERE.parent / "packmind-ui" / "dist"    # /app/packmind-ui/dist
+UI_DIST = Path(os.getenv("UI_DIST") or HERE.parent / "packmind-ui" / "dist")    # /app/packmind-ui/dist
 
-# sanity check the folder is there
-if not UI_DIST.is_dir():
-    raise RuntimeError(f"UI build not found at {UI_DIST!r}")
+if os.getenv("SERVE_UI", "1") != "0":
+    from .static import PrecompressedStaticFiles
 
-app.mount(
-    "/",
-    StaticFiles(directory=str(UI_DIST), html=True),
-    name="static",
-)
+    app.mount(
+        "/",
+        PrecompressedStaticFiles(directory=str(UI_DIST), html=True),
+        name="static",
+    )
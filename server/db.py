@@ -0,0 +1,143 @@
+"""
+Shared SQLite access for the server.
+
+Reads borrow a connection from a small pool; every connection is opened once
+with tuned pragmas and keeps its own prepared-statement cache, so hot queries
+are neither reconnected nor re-parsed per request. Writes are funnelled
+through a single writer thread that owns the only write connection: threads
+of this worker never contend for the write lock, and because the database is
+in WAL mode an ingest transaction never blocks readers.
+"""
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",   # durable at checkpoints; safe with WAL
+    "PRAGMA busy_timeout=5000",    # other worker processes may hold the write lock
+    "PRAGMA cache_size=-16000",    # 16 MiB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+_STOP = object()
+
+
+class Database:
+    def __init__(self, path: str, pool_size: int = 8, statement_cache: int = 256):
+        self.path = path
+        self.pool_size = pool_size
+        self.statement_cache = statement_cache
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def _open(self, readonly: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    # ─── Reads ────────────────────────────────────────────────────────────
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a pooled read-only connection. Connections beyond `pool_size`
+        are opened on demand and closed when returned.
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open(readonly=True)
+        try:
+            yield conn
+        finally:
+            # Never hand back a connection with a read transaction still open
+            if conn.in_transaction:
+                conn.rollback()
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    # ─── Writes ───────────────────────────────────────────────────────────
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Queue `fn(conn, *args, **kwargs)` for the writer thread and return a
+        future for its result. Writes run one at a time in submission order.
+        """
+        self._ensure_writer()
+        future: Future = Future()
+        self._writes.put((future, fn, args, kwargs))
+        return future
+
+    def write(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run `fn(conn, ...)` on the writer thread and wait for its result.
+        """
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def write_async(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Like `write`, but awaits the writer without tying up a worker thread.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    @property
+    def pending_writes(self) -> int:
+        return self._writes.qsize()
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="db-writer", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        conn = self._open()
+        try:
+            while True:
+                item = self._writes.get()
+                if item is _STOP:
+                    return
+                future, fn, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = fn(conn, *args, **kwargs)
+                except BaseException as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            conn.close()
+
+    def close(self):
+        """
+        Drain the write queue, stop the writer and close pooled connections.
+        """
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(_STOP)
+            writer.join()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,85 @@
+"""
+Structured, sampled and asynchronous logging for the server.
+
+Request handlers only enqueue log records; a `QueueListener` thread formats
+them as one JSON object per line and writes them to stderr, so a slow
+terminal or log pipe never stalls a request. High-volume events pass
+`extra={"sampled": True}` and are kept at `LOG_SAMPLE_RATE` (default 0.1);
+everything else is always logged.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from typing import Optional
+
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+# Attributes every LogRecord has; anything else came in through `extra`
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        # QueueHandler has already folded any traceback into the message
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RESERVED)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not getattr(record, "sampled", False) or random.random() < self.rate
+
+
+def configure_logging(level: str = os.getenv("LOG_LEVEL", "INFO")):
+    """
+    Route the `packmind` loggers through a queue to a background writer.
+    Safe to call more than once.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _handler = logging.handlers.QueueHandler(records)
+    _handler.addFilter(SampleFilter(LOG_SAMPLE_RATE))
+    root = logging.getLogger("packmind")
+    root.setLevel(level)
+    root.addHandler(_handler)
+    root.propagate = False
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+
+
+def shutdown_logging():
+    """
+    Flush queued records, stop the writer thread and detach the queue handler,
+    so a later `configure_logging` starts from a clean logger.
+    """
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger("packmind").removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"packmind.{name}")
@@ -0,0 +1,223 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A deliberately small registry (counters, histograms and callback gauges,
+each with optional labels) so the server needs no extra dependency. Values
+are per worker process; Prometheus sums them across workers at query time.
+`MetricsMiddleware` records per-route latency and request/response sizes,
+and the rest of the server records ingest, catalog and cache metrics through
+the module-level instruments below.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {v:g}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {row[-1]:g}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Gauge(_Metric):
+    """
+    Gauge whose samples are read from `collect()` at scrape time.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]], labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {v:g}" for k, v in self.collect()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ─── HTTP ─────────────────────────────────────────────────────────────────
+http_requests = REGISTRY.register(Counter(
+    "packmind_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+http_latency = REGISTRY.register(Histogram(
+    "packmind_http_request_duration_seconds", "Time to complete an HTTP response (streams excluded).",
+    ("route", "method")))
+http_request_size = REGISTRY.register(Histogram(
+    "packmind_http_request_size_bytes", "HTTP request body size as received.", ("route",), SIZE_BUCKETS))
+http_response_size = REGISTRY.register(Histogram(
+    "packmind_http_response_size_bytes", "HTTP response body size as sent.", ("route",), SIZE_BUCKETS))
+http_cache = REGISTRY.register(Counter(
+    "packmind_http_cache_total", "Conditional GETs answered with 304 (hit) or a full body (miss).",
+    ("route", "result")))
+
+# ─── Ingest ───────────────────────────────────────────────────────────────
+violations_ingested = REGISTRY.register(Counter(
+    "packmind_violations_ingested_total", "Violations received by /api/upload (use rate() for per second).",
+    ("repo",)))
+violations_changed = REGISTRY.register(Counter(
+    "packmind_violations_changed_total", "Ingested violations that were new, reopened or moved.", ("repo",)))
+violations_resolved = REGISTRY.register(Counter(
+    "packmind_violations_resolved_total", "Violations resolved by a completed full run.", ("repo",)))
+upload_batches = REGISTRY.register(Counter(
+    "packmind_upload_batches_total", "Upload batches stored, acknowledged as replays or rejected as conflicts.", ("result",)))
+ingest_stage = REGISTRY.register(Histogram(
+    "packmind_ingest_stage_seconds", "Time spent per upload stage (read, map, store).", ("stage",)))
+
+# ─── ADR catalog ──────────────────────────────────────────────────────────
+adr_refresh = REGISTRY.register(Histogram(
+    "packmind_adr_refresh_seconds", "Duration of ADR catalog rescans.", ("changed",)))
+adr_files = REGISTRY.register(Counter(
+    "packmind_adr_files_total",
+    "ADR files seen by rescans: unchanged (stat hit), touched (hash hit) or parsed (miss).", ("result",)))
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware, so streamed responses (SSE, uploads) pass through
+    untouched. Routes are labelled by their path template to keep label
+    cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = {"code": 500, "stream": False}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(b"text/event-stream"):
+                        status["stream"] = True
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = scope.get("route")
+            label = (getattr(route, "path", None) or "/") if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests.inc(label, method, str(status["code"]))
+            if not status["stream"]:
+                http_latency.observe(time.perf_counter() - start, label, method)
+            http_request_size.observe(sizes["request"], label)
+            http_response_size.observe(sizes["response"], label)
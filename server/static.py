@@ -0,0 +1,169 @@
+"""
+Static serving for the built UI.
+
+`PrecompressedStaticFiles` serves the `.br`/`.gz` siblings that
+`python -m server.static <dist>` writes after `npm run build`, picking the
+best encoding the client accepts. Vite's content-hashed assets under `assets/`
+never change under the same name, so they are sent as immutable for a year;
+everything else (index.html in particular) is revalidated through its ETag.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import sys
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from .log import get_logger
+
+log = get_logger("static")
+
+try:
+    import brotli  # optional: .br variants at build time
+except ImportError:
+    brotli = None
+
+# Vite writes its content-hashed outputs, named `<name>-<8 char hash>.<ext>`,
+# to `assets/` (build.assetsDir); files elsewhere (public/, index.html) keep
+# their names across builds and must be revalidated
+ASSETS_DIR = "assets"
+HASHED_ASSET = re.compile(r"-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Encodings in order of preference, with the suffix of their variant file
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".map", ".xml", ".wasm"}
+MIN_SIZE = 512
+
+
+def _accepted(scope: Scope) -> set:
+    """
+    Content codings the client accepts with a non-zero weight.
+    """
+    accepted = set()
+    for part in Headers(scope=scope).get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                pass
+        if name.strip() and weight > 0:
+            accepted.add(name.strip().lower())
+    if "*" in accepted:
+        accepted.update(e for e, _ in ENCODINGS)
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that prefers precompressed variants and sets cache headers.
+    A missing directory is not an error: it just serves 404s, so an API-only
+    worker can run without the UI build.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("check_dir", False)
+        super().__init__(*args, **kwargs)
+        # full path -> (mtime_ns, {encoding: (variant path, stat)})
+        self._variants: Dict[str, Tuple[int, Dict[str, Tuple[str, os.stat_result]]]] = {}
+
+    async def check_config(self) -> None:
+        if self.directory is not None and not os.path.isdir(self.directory):
+            log.warning("UI build not found; serving API only", extra={"directory": str(self.directory)})
+            return
+        await super().check_config()
+
+    def _lookup_variants(self, full_path: str, stat_result: os.stat_result):
+        cached = self._variants.get(full_path)
+        if cached is not None and cached[0] == stat_result.st_mtime_ns:
+            return cached[1]
+        found = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            # A variant older than its source is stale; never serve it
+            if variant_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+                found[encoding] = (full_path + suffix, variant_stat)
+        self._variants[full_path] = (stat_result.st_mtime_ns, found)
+        return found
+
+    def _is_hashed_asset(self, full_path: str) -> bool:
+        if self.directory is None:
+            return False
+        relative = os.path.relpath(os.path.realpath(full_path), os.path.realpath(self.directory)).replace(os.sep, "/")
+        folder, _, name = relative.rpartition("/")
+        return folder == ASSETS_DIR and bool(HASHED_ASSET.search(name))
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        full_path = str(full_path)
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": IMMUTABLE if self._is_hashed_asset(full_path) else REVALIDATE}
+
+        variants = self._lookup_variants(full_path, stat_result)
+        chosen: Optional[Tuple[str, Tuple[str, os.stat_result]]] = None
+        if variants and "range" not in request_headers:
+            accepted = _accepted(scope)
+            chosen = next(((e, variants[e]) for e, _ in ENCODINGS if e in variants and e in accepted), None)
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        if chosen is not None:
+            encoding, (variant_path, variant_stat) = chosen
+            headers["Content-Encoding"] = encoding
+            response = FileResponse(
+                variant_path,
+                status_code=status_code,
+                stat_result=variant_stat,
+                media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+                headers=headers,
+            )
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def precompress(directory: str) -> int:
+    """
+    Write `.gz` (and `.br` when the `brotli` package is installed) variants
+    next to every compressible file under `directory` that is worth it.
+    Returns the number of variant files written.
+    """
+    written = 0
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE or os.path.getsize(path) < MIN_SIZE:
+                continue
+            with open(path, "rb") as fh:
+                raw = fh.read()
+            variants = [(".gz", gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append((".br", brotli.compress(raw, quality=11)))
+            for suffix, data in variants:
+                # Keep only variants that actually save bytes
+                if len(data) < len(raw):
+                    with open(path + suffix, "wb") as fh:
+                        fh.write(data)
+                    written += 1
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python -m server.static <dist directory>", file=sys.stderr)
+        sys.exit(2)
+    count = precompress(sys.argv[1])
+    note = "" if brotli is not None else " (install `brotli` for .br variants)"
+    print(f"Wrote {count} precompressed file(s) under {sys.argv[1]}{note}")
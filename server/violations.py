@@ -0,0 +1,390 @@
+"""
+SQLite-backed violation store.
+
+Violations live in the `violation` table of packmind.db (schema created by
+`init_db` in app.py). Reads use pooled connections and writes go through the
+single writer thread of `db.Database`; the database runs in WAL mode, so
+dashboard reads are never blocked by an ingest transaction and every uvicorn
+worker sees the same data.
+
+Each distinct problem is stored once. A violation is identified by a stable
+fingerprint of (repo, adr_id, normalized file, line or context, message);
+re-uploading it only bumps its `last_seen`/`occurrences` counters, and it
+only re-enters the change feed when it is reopened or moves.
+"""
+import hashlib
+import posixpath
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from .db import Database
+
+# Columns a client may project, mapped to their SQL expression.
+FIELDS = {
+    "id":         "id",
+    "repo":       "repo",
+    "adr_id":     "adr_id",
+    "file":       "file",
+    "line":       "line",
+    "message":    "message",
+    "severity":   "severity",
+    "commit":     "commit_sha",
+    "upload_id":  "upload_id",
+    "created_at": "created_at",
+    "last_seen":  "last_seen",
+    "occurrences": "occurrences",
+    "fingerprint": "fingerprint",
+    "seq":        "seq",
+    "status":     "CASE WHEN resolved_at IS NULL THEN 'open' ELSE 'resolved' END",
+}
+DEFAULT_FIELDS = ("id", "adr_id", "file", "line", "message", "severity")
+CHANGE_FIELDS = ("id", "seq", "status", "adr_id", "file", "line", "message", "severity")
+STATUSES = ("open", "resolved", "all")
+
+
+def normalize_path(path: str) -> str:
+    """
+    Normalize a reported file path so that the same file reported by
+    different tools or runners compares equal.
+    """
+    path = path.replace("\\", "/")
+    if path.startswith("file://"):
+        path = path[len("file://"):]
+    return posixpath.normpath(path) if path else path
+
+
+def _normalize_prefix(prefix: str) -> str:
+    """
+    Normalize a `file_prefix` filter like the stored paths, keeping a
+    trailing `/` so that `src/` still excludes `src2/...`.
+    """
+    prefix = prefix.replace("\\", "/")
+    normalized = normalize_path(prefix)
+    if normalized == ".":
+        return ""
+    if prefix.endswith("/") and not normalized.endswith("/"):
+        normalized += "/"
+    return normalized
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+def fingerprint(repo: str, adr_id: str, file: str, line: int, message: str, context: Optional[str] = None) -> str:
+    """
+    Stable identity of a violation across uploads. When the tool provides a
+    context (source snippet or its own line hash) it replaces the line
+    number, so the violation survives code moving around it.
+    """
+    location = "c:" + _squash(context) if context else f"l:{line}"
+    key = "\0".join((repo, adr_id, normalize_path(file), location, _squash(message or "")))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def batch_digest(commit: Optional[str], violations: Iterable[dict]) -> str:
+    """
+    Content hash of one upload batch, used to tell a genuine replay from a
+    different batch sent under the same idempotency key. Severity is left
+    out: it comes from the catalog, which may change between retries.
+    """
+    digest = hashlib.sha256((commit or "").encode("utf-8"))
+    for v in violations:
+        fields = (v["adr_id"], v["file"], str(v["line"]), v["message"] or "", v.get("context") or "")
+        digest.update(("\n" + "\0".join(fields)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BatchConflict(Exception):
+    """
+    A batch reused an (upload id, batch index) already stored for the repo
+    with different content.
+    """
+
+
+class ViolationStore:
+    def __init__(self, db: Database):
+        self._db = db
+
+    def insert_many(self, *args, **kwargs) -> Tuple[int, int, bool]:
+        return self._db.write(self._insert_many, *args, **kwargs)
+
+    async def insert_many_async(self, *args, **kwargs) -> Tuple[int, int, bool]:
+        return await self._db.write_async(self._insert_many, *args, **kwargs)
+
+    def resolve_missing(self, *args, **kwargs) -> Optional[int]:
+        return self._db.write(self._resolve_missing, *args, **kwargs)
+
+    async def resolve_missing_async(self, *args, **kwargs) -> Optional[int]:
+        return await self._db.write_async(self._resolve_missing, *args, **kwargs)
+
+    @staticmethod
+    def _insert_many(
+        conn: sqlite3.Connection,
+        repo: str,
+        commit: str,
+        upload_id: str,
+        violations: Iterable[dict],
+        batch: int = 0,
+        digest: Optional[str] = None,
+    ) -> Tuple[int, int, bool]:
+        """
+        Upsert one upload batch in a single transaction, keyed on each
+        violation's fingerprint. New violations are inserted; known ones get
+        their `last_seen`, `occurrences` and `last_upload_id` updated in place
+        (once per upload), and only take a new change sequence number when
+        they are reopened or their line moved.
+
+        Each (repo, upload_id, batch) is recorded with the batch's
+        `batch_digest`, so a replayed batch is acknowledged without being
+        applied twice, while a different batch under the same key raises
+        BatchConflict. Returns (row count, rows that entered the change feed,
+        whether the batch was a replay).
+        """
+        now = time.time()
+        items = list(violations)
+        if digest is None:
+            digest = batch_digest(commit, items)
+        try:
+            # IMMEDIATE takes the write lock up front, so no other worker
+            # process can hand out the same change sequence numbers.
+            conn.execute("BEGIN IMMEDIATE")
+            seen = conn.execute(
+                "SELECT count, digest FROM upload_batch WHERE repo = ? AND upload_id = ? AND batch = ?",
+                (repo, upload_id, batch),
+            ).fetchone()
+            if seen is not None:
+                conn.rollback()
+                if seen[1] != digest:
+                    raise BatchConflict(
+                        f"Batch {batch} of upload {upload_id} was already stored for {repo} with different content"
+                    )
+                return seen[0], 0, True
+            base = ViolationStore._head(conn, repo)
+            # Sequence numbers of unchanged rows are simply never used; the
+            # feed only needs them to be increasing, not contiguous.
+            conn.executemany(
+                """
+                INSERT INTO violation
+                    (repo, fingerprint, adr_id, file, line, message, severity, commit_sha,
+                     upload_id, last_upload_id, created_at, last_seen, occurrences, seq)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (repo, fingerprint) DO UPDATE SET
+                    seq = CASE
+                        WHEN resolved_at IS NOT NULL OR line IS NOT excluded.line THEN excluded.seq
+                        ELSE seq
+                    END,
+                    line = excluded.line,
+                    severity = excluded.severity,
+                    commit_sha = excluded.commit_sha,
+                    last_upload_id = excluded.last_upload_id,
+                    last_seen = excluded.last_seen,
+                    occurrences = occurrences + 1,
+                    resolved_at = NULL
+                WHERE last_upload_id IS NOT excluded.last_upload_id
+                """,
+                [
+                    (
+                        repo,
+                        fingerprint(repo, v["adr_id"], v["file"], v["line"], v["message"], v.get("context")),
+                        v["adr_id"],
+                        normalize_path(v["file"]),
+                        v["line"],
+                        v["message"],
+                        v.get("severity"),
+                        commit,
+                        upload_id,
+                        upload_id,
+                        now,
+                        now,
+                        base + i,
+                    )
+                    for i, v in enumerate(items, start=1)
+                ],
+            )
+            changed = conn.execute(
+                "SELECT COUNT(*) FROM violation WHERE repo = ? AND seq > ?", (repo, base)
+            ).fetchone()[0]
+            conn.execute(
+                """
+                INSERT INTO upload_batch (repo, upload_id, batch, digest, count, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (repo, upload_id, batch, digest, len(items), now),
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return len(items), changed, False
+
+    @staticmethod
+    def _resolve_missing(
+        conn: sqlite3.Connection,
+        repo: str,
+        upload_id: str,
+        batches: int,
+        adr_ids: Optional[Sequence[str]] = None,
+    ) -> Optional[int]:
+        """
+        Close a full run: resolve every open violation of `repo` (optionally
+        restricted to `adr_ids`) that upload `upload_id` did not report.
+        Returns the number of resolved violations, or None when the server
+        has not stored exactly `batches` batches of that upload, in which case
+        nothing is resolved.
+        """
+        now = time.time()
+        where = ["repo = ?", "resolved_at IS NULL", "last_upload_id IS NOT ?"]
+        params: list = [repo, upload_id]
+        if adr_ids:
+            where.append(f"adr_id IN ({', '.join('?' * len(adr_ids))})")
+            params += list(adr_ids)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            stored = conn.execute(
+                "SELECT COUNT(*) FROM upload_batch WHERE repo = ? AND upload_id = ?",
+                (repo, upload_id),
+            ).fetchone()[0]
+            if stored != batches:
+                conn.rollback()
+                return None
+            ids = [r[0] for r in conn.execute(
+                f"SELECT id FROM violation WHERE {' AND '.join(where)} ORDER BY id", params
+            )]
+            base = ViolationStore._head(conn, repo)
+            conn.executemany(
+                "UPDATE violation SET resolved_at = ?, seq = ? WHERE id = ?",
+                [(now, base + i, vid) for i, vid in enumerate(ids, start=1)],
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return len(ids)
+
+    @staticmethod
+    def _head(conn: sqlite3.Connection, repo: str) -> int:
+        return conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM violation WHERE repo = ?", (repo,)
+        ).fetchone()[0]
+
+    def head(self, repo: str) -> int:
+        """
+        Current change cursor for `repo`: the highest sequence number handed
+        out so far. Every insert or resolution bumps it.
+        """
+        with self._db.read() as conn:
+            return self._head(conn, repo)
+
+    def summary(self, repo: str, days: int = 30, top_files: int = 20) -> dict:
+        """
+        Return `repo`'s open-violation counts per ADR, its `top_files` files
+        with the most open violations and the opened/resolved trend of the
+        last `days` days. Reads only the aggregate tables maintained by the
+        violation triggers, so the cost does not depend on history size.
+        """
+        since_day = time.strftime("%Y-%m-%d", time.gmtime(time.time() - (days - 1) * 86400))
+        with self._db.read() as conn:
+            by_adr = conn.execute(
+                "SELECT adr_id, open, total FROM violation_by_adr WHERE repo = ? ORDER BY adr_id",
+                (repo,),
+            ).fetchall()
+            by_file = conn.execute(
+                """
+                SELECT file, open FROM violation_by_file
+                WHERE repo = ? AND open > 0 ORDER BY open DESC, file LIMIT ?
+                """,
+                (repo, top_files),
+            ).fetchall()
+            trend = conn.execute(
+                "SELECT day, opened, resolved FROM violation_daily WHERE repo = ? AND day >= ? ORDER BY day",
+                (repo, since_day),
+            ).fetchall()
+            head = self._head(conn, repo)
+        return {
+            "open": sum(r[1] for r in by_adr),
+            "by_adr": [{"adr_id": a, "open": o, "total": t} for a, o, t in by_adr],
+            "by_file": [{"file": f, "open": o} for f, o in by_file],
+            "trend": [{"day": d, "opened": o, "resolved": r} for d, o, r in trend],
+            "cursor": head,
+        }
+
+    def changes(
+        self,
+        repo: str,
+        since: int,
+        adr_id: Optional[str] = None,
+        limit: int = 500,
+        fields: Sequence[str] = CHANGE_FIELDS,
+    ) -> List[dict]:
+        """
+        Return violations of `repo` added or resolved after cursor `since`,
+        in sequence order. Each row carries its `seq`, the cursor to resume
+        from, and a `status` of "open" or "resolved".
+        """
+        where = ["repo = ?", "seq > ?"]
+        params: list = [repo, since]
+        if adr_id is not None:
+            where.append("adr_id = ?")
+            params.append(adr_id)
+        params.append(limit)
+
+        columns = ", ".join(FIELDS[f] for f in fields)
+        sql = f"SELECT {columns} FROM violation WHERE {' AND '.join(where)} ORDER BY seq LIMIT ?"
+        with self._db.read() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [dict(zip(fields, r)) for r in rows]
+
+    def query(
+        self,
+        repo: str,
+        adr_id: Optional[str] = None,
+        file_prefix: Optional[str] = None,
+        severity: Optional[str] = None,
+        status: str = "open",
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        after: Optional[int] = None,
+        limit: int = 500,
+        fields: Sequence[str] = DEFAULT_FIELDS,
+    ) -> List[dict]:
+        """
+        Return one page of a repo's violations in id order.
+
+        Pagination is keyset-based: pass the last `id` of the previous page as
+        `after`. The file prefix is expressed as a range so that it can use the
+        (repo, file) index.
+        """
+        where = ["repo = ?"]
+        params: list = [repo]
+        if adr_id is not None:
+            where.append("adr_id = ?")
+            params.append(adr_id)
+        file_prefix = _normalize_prefix(file_prefix) if file_prefix else file_prefix
+        if file_prefix:
+            where.append("file >= ? AND file < ?")
+            params += [file_prefix, file_prefix + "\U0010ffff"]
+        if severity is not None:
+            where.append("severity = ?")
+            params.append(severity)
+        if status == "open":
+            where.append("resolved_at IS NULL")
+        elif status == "resolved":
+            where.append("resolved_at IS NOT NULL")
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+        if after is not None:
+            where.append("id > ?")
+            params.append(after)
+        params.append(limit)
+
+        columns = ", ".join(FIELDS[f] for f in fields)
+        sql = f"SELECT {columns} FROM violation WHERE {' AND '.join(where)} ORDER BY id LIMIT ?"
+        with self._db.read() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [dict(zip(fields, r)) for r in rows]
@@ -1,41 +1,166 @@
 #!/usr/bin/env python3
 """
 junit XML → SARIF converter, strips trailing () from rule names
-usage: python3 xml2sarif.py input.xml output.sarif
+usage: python3 xml2sarif.py [--jobs N] [--ndjson] INPUT... OUTPUT
+
+INPUT may be a JUnit XML file, a directory (searched recursively for *.xml)
+or a glob. OUTPUT is a file path or `-` for stdout. With --ndjson, one
+{"tool", "result"} object is written per line instead of a SARIF document,
+followed by an {"end": true, "count": N} trailer, which `packmind_cli.py
+--sarif -` reads from stdin (a stream without the trailer was cut short):
+
+    python3 xml2sarif.py --ndjson build/test-results - | python3 cli/packmind_cli.py --sarif - ...
 """
-import json, sys, xml.etree.ElementTree as ET, pathlib
-
-junit, sarif_out = sys.argv[1], sys.argv[2]
-root = ET.parse(junit).getroot()
-results = []
-
-for tc in root.iter("testcase"):
-    fails = tc.findall("failure")
-    if not fails:
-        continue
-
-    # Grab the method name; e.g. "ui_should_not_access_core()"
-    raw_name = tc.attrib.get("name", "")
-    # Strip any trailing "()" if present
-    rule_id = raw_name.rstrip("()")
-
-    # Grab failure message text
-    fail_elem = fails[0]
-    msg = (fail_elem.attrib.get("message") or (fail_elem.text or "")).strip()
-
-    # Build SARIF result
-    results.append({
-        "ruleId": rule_id,
-        "message": {"text": msg},
-        "locations": [{
-            "physicalLocation": {
-                "artifactLocation": {
-                    "uri": tc.attrib["classname"].replace(".", "/") + ".java"
-                }
-            }
-        }]
-    })
-
-sarif = {"runs": [{"tool": {"driver": {"name": "archunit"}}, "results": results}]}
-pathlib.Path(sarif_out).write_text(json.dumps(sarif, indent=2))
-print(f"Wrote {sarif_out} with {len(results)} result(s)")
+import argparse, glob, json, os, sys, xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+TOOL = "archunit"
+
+
+class ConversionError(Exception):
+    pass
+
+
+def expand_inputs(inputs):
+    """
+    Resolve files, directories and glob patterns into a sorted, de-duplicated
+    list of XML files.
+    """
+    found = []
+    for arg in inputs:
+        if os.path.isdir(arg):
+            matches = glob.glob(os.path.join(arg, "**", "*.xml"), recursive=True)
+        elif glob.has_magic(arg):
+            matches = glob.glob(arg, recursive=True)
+        else:
+            matches = [arg]
+        found.extend(sorted(matches))
+    return list(dict.fromkeys(found))
+
+
+def convert_file(junit):
+    """
+    Return the SARIF results of one JUnit XML file. The file is read with
+    iterparse and every processed testcase is cleared, so only one test case
+    (plus the empty shells of earlier ones) is held at a time.
+    """
+    try:
+        return _convert(junit)
+    except ET.ParseError as e:
+        raise ConversionError(f"Invalid JUnit XML in {junit}: {e}")
+    except OSError as e:
+        raise ConversionError(f"Cannot read {junit}: {e}")
+
+
+def _convert(junit):
+    results = []
+    for _event, elem in ET.iterparse(junit, events=("end",)):
+        if elem.tag in ("system-out", "system-err"):
+            elem.clear()
+            continue
+        if elem.tag != "testcase":
+            continue
+        fails = elem.findall("failure")
+        if fails:
+            # Grab the method name; e.g. "ui_should_not_access_core()"
+            raw_name = elem.attrib.get("name", "")
+            # Strip any trailing "()" if present
+            rule_id = raw_name.rstrip("()")
+
+            # Grab failure message text
+            fail_elem = fails[0]
+            msg = (fail_elem.attrib.get("message") or (fail_elem.text or "")).strip()
+
+            # Build SARIF result
+            results.append({
+                "ruleId": rule_id,
+                "message": {"text": msg},
+                "locations": [{
+                    "physicalLocation": {
+                        "artifactLocation": {
+                            "uri": elem.attrib["classname"].replace(".", "/") + ".java"
+                        }
+                    }
+                }]
+            })
+        elem.clear()
+    return results
+
+
+def iter_results(files, jobs=1):
+    """
+    Yield the SARIF results of `files` in input order, converting up to
+    `jobs` files at once in worker processes.
+    """
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for results in pool.map(convert_file, files, chunksize=8):
+                yield from results
+    else:
+        for junit in files:
+            yield from convert_file(junit)
+
+
+def write_sarif(results, out):
+    """
+    Write one compact SARIF document, streaming results as they arrive.
+    """
+    out.write('{"runs":[{"tool":{"driver":{"name":"%s"}},"results":[' % TOOL)
+    count = 0
+    for res in results:
+        out.write(("," if count else "") + json.dumps(res, separators=(",", ":")))
+        count += 1
+    out.write("]}]}\n")
+    return count
+
+
+def write_ndjson(results, out):
+    count = 0
+    for res in results:
+        out.write(json.dumps({"tool": TOOL, "result": res}, separators=(",", ":")) + "\n")
+        count += 1
+    # Only a complete conversion gets the trailer; readers reject streams without it
+    out.write(json.dumps({"end": True, "count": count}) + "\n")
+    return count
+
+
+def main():
+    p = argparse.ArgumentParser(description="Convert JUnit XML reports to SARIF")
+    p.add_argument("inputs", nargs="+", help="JUnit XML files, directories or globs")
+    p.add_argument("output", help="Output path, or - for stdout")
+    p.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="Worker processes (default: %(default)s)")
+    p.add_argument("--ndjson", action="store_true", help="Write one SARIF result per line instead of a SARIF document")
+    args = p.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print(f"No JUnit XML found in: {' '.join(args.inputs)}", file=sys.stderr)
+        sys.exit(1)
+    missing = [f for f in files if not os.path.isfile(f)]
+    if missing:
+        print(f"JUnit XML not found: {' '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+
+    write = write_ndjson if args.ndjson else write_sarif
+    results = iter_results(files, args.jobs)
+    try:
+        if args.output == "-":
+            count = write(results, sys.stdout)
+        else:
+            tmp_out = args.output + ".tmp"
+            try:
+                with open(tmp_out, "w", encoding="utf-8") as fh:
+                    count = write(results, fh)
+            except BaseException:
+                os.remove(tmp_out)
+                raise
+            os.replace(tmp_out, args.output)
+    except ConversionError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    # Keep stdout clean for the NDJSON pipe
+    print(f"Wrote {args.output} with {count} result(s) from {len(files)} file(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()